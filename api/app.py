@@ -5,69 +5,135 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import streamlit as st
 from data.model import RAG
-from dotenv import load_dotenv
+from data.config import configure
 from data.excel_model import ExcelBot
-import pandas as pd
-import langchain
+import tempfile
+import hashlib
+import weakref
+import shutil
+
+configure()
+
+
+class UploadDir:
+    """
+    A per-session temporary directory, so concurrent sessions never overwrite
+    each other. It is removed when the session's state is garbage collected
+    (the browser session ended) or when the process exits.
+    """
+
+    def __init__(self) -> None:
+        self.path = tempfile.mkdtemp(prefix="pdfexcel-upload-")
+        self._finalizer = weakref.finalize(
+            self, shutil.rmtree, self.path, ignore_errors=True
+        )
+
+    def clear(self) -> None:
+        """Drop the previous upload; the directory itself is kept."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+
+
+# Streamlit reruns this script on every interaction. Anything expensive lives in
+# st.session_state, keyed by the upload's content hash, so it is built once per
+# upload and per browser session rather than once per keystroke.
+state = st.session_state
+if "messages" not in state:
+    state.messages = []
+if "upload_dir" not in state:
+    state.upload_dir = UploadDir()
+    state.upload_digest = None
+    state.ingested = set()  # (user_id, upload digest)
+    state.excel_bots = {}  # (upload digest, sheet name) -> ExcelBot
+    state.rag_models = {}  # api key -> RAG
+
+
+def save_upload(uploaded_file) -> tuple[str, str]:
+    """Write the upload to this session's directory once; return (digest, path)."""
+    data = uploaded_file.getbuffer()
+    digest = hashlib.sha256(data).hexdigest()
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(state.upload_dir.path, f"{digest}{extension}")
+    if digest != state.upload_digest:
+        # A new file replaces the session's previous upload and its resources
+        state.upload_dir.clear()
+        state.excel_bots = {}
+        state.messages = []
+        state.upload_digest = digest
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(data)
+    return digest, path
+
+
+def get_rag_model(api_key: str) -> RAG:
+    if api_key not in state.rag_models:
+        state.rag_models[api_key] = RAG(api_key)
+    return state.rag_models[api_key]
 
-langchain.debug=True
-
-load_dotenv()
 
 st.title("Chat with Excel and PDF")
 api_key = st.text_input("OpenAI API Key:-", key="api_key")
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-
-
 uploaded_file = st.file_uploader(
     "Upload an Excel/CSV/PDF file", type=["xlsx", "xls", "pdf", "csv"]
 )
 
 if uploaded_file and api_key:
-    file_details = {"filetype": uploaded_file.type}
-
-    try:
-        rag_chain.delete_db()
-        # st.session_state.messages = []
-
-    except:
-        pass
     # Checking file type based on MIME type
     try:
+        digest, file_path = save_upload(uploaded_file)
         if uploaded_file.type == "application/pdf":
-            rag_model = RAG(api_key)
+            rag_model = get_rag_model(api_key)
             user_id = st.text_input("Enter User ID:", key="user_id")
             if user_id:
-                with open("uploaded_file.pdf", "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-
-                rag_model.load_db("uploaded_file.pdf", user_id)
+                if (user_id, digest) not in state.ingested:
+                    with st.spinner("Loading the document..."):
+                        # The temp path changes per session and per version,
+                        # the filename keeps chunk ids stable across both
+                        rag_model.load_db(
+                            file_path,
+                            user_id,
+                            source=uploaded_file.name,
+                            content_digest=digest,
+                        )
+                    state.ingested = {
+                        key for key in state.ingested if key[0] != user_id
+                    } | {(user_id, digest)}
                 st.success("Database loaded successfully!")
                 delete_button = st.button("Delete Database (if existing)")
                 clear_chat_history = st.button("Clear Chat")
 
                 if delete_button:
                     rag_model.delete_db(user_id)
+                    state.ingested = {
+                        key for key in state.ingested if key[0] != user_id
+                    }
                     st.success("Database deleted successfully!")
 
-                for message in st.session_state.messages:
+                for message in state.messages:
                     with st.chat_message(message["role"]):
                         st.markdown(message["content"])
 
                 if clear_chat_history:
-                    st.session_state.messages = []
+                    state.messages = []
 
                 if prompt := st.chat_input("What is up?"):
-                    st.session_state.messages.append({"role": "user", "content": prompt})
+                    state.messages.append({"role": "user", "content": prompt})
                     with st.chat_message("user"):
                         st.markdown(prompt)
 
                     with st.chat_message("assistant"):
-                        answer = rag_model.invoke(user_id=user_id, query=prompt)
-                        st.markdown(answer)
-                        st.session_state.messages.append(
+                        # Render tokens as they arrive instead of the final answer
+                        timings = {}
+                        answer = st.write_stream(
+                            rag_model.stream(user_id, prompt, timings=timings)
+                        )
+                        st.caption(
+                            f"First token {timings.get('ttft', 0):.2f}s, "
+                            f"total {timings.get('total', 0):.2f}s"
+                        )
+                        state.messages.append(
                             {"role": "assistant", "content": answer}
                         )
 
@@ -76,35 +142,29 @@ if uploaded_file and api_key:
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             "text/csv"
         ]:
-            if uploaded_file.type=="text/csv":
-                temp_file = "uploaded_file.csv"
-            else:
-                temp_file = "uploaded_file.xlsx"
-            with open(temp_file, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            if ".csv" in temp_file:
-                df = pd.read_csv(uploaded_file)
+            excelbot = None
+            sheet_name = 0
+            if uploaded_file.type != "text/csv":
+                sheet_name = st.text_input(
+                    "Sheet name (e.g., Master_Sheet) or Number(e.g., 3)", value=0
+                )
+                try:
+                    sheet_name = int(sheet_name)
+                except ValueError:
+                    pass
+            if sheet_name != "":
+                key = (digest, sheet_name)
+                if key not in state.excel_bots:
+                    with st.spinner("Loading the spreadsheet..."):
+                        state.excel_bots[key] = ExcelBot(
+                            file_path=file_path, sheet_name=sheet_name, api_key=api_key
+                        )
+                excelbot = state.excel_bots[key]
                 st.write("DataFrame Preview:")
-                st.write(df.head())
-                excelbot = ExcelBot(file_path=temp_file, api_key=api_key)
-            else:
-                sheet_name = st.text_input("Sheet name (e.g., Master_Sheet) or Number(e.g., 3)", value=0)
-                print(sheet_name)
-                if sheet_name:
-                    try:
-                        sheet_name = int(sheet_name)
-                    except:
-                        pass
-                    # df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-                    # st.write(df.head())
-                    print("Sheet name is ", sheet_name, "Sheet name type is ", type(sheet_name))
-                    excelbot = ExcelBot(file_path=temp_file, api_key=api_key, sheet_name=sheet_name)
-                    st.write("DataFrame Preview:")
-                    st.write(excelbot.clean_df.head())
+                st.write(excelbot.clean_df.head())
 
             query = st.text_input("Enter your query")
-            if query:
+            if query and excelbot is not None:
 
                 # Process the uploaded file and query
                 output = excelbot.excel_invoke(query)
@@ -116,4 +176,4 @@ if uploaded_file and api_key:
         else:
             st.write("The uploaded file is neither a PDF nor an Excel file.")
     except Exception as e:
-        st.write(e)
\ No newline at end of file
+        st.write(e)
@@ -3,12 +3,134 @@ import sys
 
 # Add the project directory to the sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from flask import Flask, request, jsonify
-from data.model import RAG
-from data.excel_model import ExcelBot
-import pandas as pd
+from flask import Flask, Request, Response, request, jsonify, stream_with_context
+from data.response_cache import get_response_cache
+from data.uploads import HashingSpool, UploadRegistry
+from data.tracing import get_tracer, render_gauges
+from data.config import configure
+import threading
+import logging
+import shutil
+import json
+import io
+
+# Only Flask and the lightweight registries load at boot. LangChain, Chroma,
+# pandas and pandasai are imported by the first request that needs them, or
+# ahead of time by warm_up().
+configure()
+
+
+class UploadRequest(Request):
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        # Multipart file parts are hashed as werkzeug spools them off the socket
+        return HashingSpool()
+
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+if os.getenv("UPLOAD_MAX_BYTES"):
+    app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("UPLOAD_MAX_BYTES"))
+
+DOCUMENT_UPLOAD_FORMATS = ["pdf", "txt", "text", "md"]
+SPREADSHEET_UPLOAD_FORMATS = ["csv", "xlsx", "xls"]
+
+_services: dict = {}
+_services_lock = threading.Lock()
+
+
+def get_session_registry():
+    with _services_lock:
+        if "sessions" not in _services:
+            from data.session import SessionRegistry
+
+            _services["sessions"] = SessionRegistry(
+                idle_timeout=float(os.getenv("RAG_SESSION_IDLE_TIMEOUT", 1800))
+            )
+        return _services["sessions"]
+
+
+def get_rag():
+    from data.model import RAG
+
+    return RAG(registry=get_session_registry())
+
+
+def get_ingest_jobs():
+    with _services_lock:
+        if "ingest_jobs" not in _services:
+            from data.jobs import IngestJobQueue
+
+            _services["ingest_jobs"] = IngestJobQueue(
+                rag_factory=get_rag,
+                max_workers=int(os.getenv("INGEST_MAX_WORKERS", 2)),
+            )
+        return _services["ingest_jobs"]
+
+
+def get_excel_bot_cache():
+    with _services_lock:
+        if "excel_bots" not in _services:
+            from data.excel_cache import ExcelBotCache
+
+            _services["excel_bots"] = ExcelBotCache(
+                max_entries=int(os.getenv("EXCEL_CACHE_MAX_ENTRIES", 16)),
+                max_bytes=int(os.getenv("EXCEL_CACHE_MAX_BYTES", 2 * 1024**3)),
+            )
+        return _services["excel_bots"]
+
+
+def get_upload_registry():
+    with _services_lock:
+        if "uploads" not in _services:
+            _services["uploads"] = UploadRegistry()
+        return _services["uploads"]
+
+
+def warm_up(subsystems=("rag", "excel")) -> None:
+    """
+    Import the heavy dependencies and build the HTTP model clients ahead of
+    traffic.
+
+    Run it before the server forks its workers (e.g. `gunicorn --preload` with
+    API_WARM_UP set) so every worker inherits the loaded modules instead of
+    importing them on its first request. Nothing backed by SQLite is opened
+    here (Chroma, the embedding cache, the job queue): SQLite connections must
+    not cross a fork. Each worker opens those on first use, or in
+    `warm_worker()` from a post-fork hook.
+    """
+    if "rag" in subsystems:
+        get_session_registry().get_llm()
+        import chromadb  # noqa: F401
+        import data.embedding_cache  # noqa: F401
+        import data.jobs  # noqa: F401
+        import data.model  # noqa: F401
+    if "excel" in subsystems:
+        get_excel_bot_cache()
+        import data.excel_model  # noqa: F401
+
+
+def warm_worker(subsystems=("rag",)) -> None:
+    """
+    Open this process's SQLite-backed handles: the Chroma client, the embedding
+    cache and the ingest job queue. Call it after the fork, e.g. from
+    gunicorn's `post_fork` hook, to take that cost off the first request.
+    """
+    if "rag" in subsystems:
+        registry = get_session_registry()
+        registry.get_embeddings()
+        registry.get_client()
+        get_ingest_jobs()
+
+
+if os.getenv("API_WARM_UP"):
+    # "1" warms everything, otherwise a comma-separated list of subsystems
+    warm_up(
+        ("rag", "excel")
+        if os.getenv("API_WARM_UP") == "1"
+        else tuple(os.getenv("API_WARM_UP").split(","))
+    )
 
 
 @app.route("/load_db", methods=["POST"])
@@ -21,9 +143,25 @@ def load_db():
     if file_path and user_id:
         if file_extension in supported_formats:
             try:
-                rag_model = RAG()
-                rag_model.load_db(file_path, user_id)
-                return jsonify({"success": "Database loaded successfully"}), 200
+
+                def on_complete(job):
+                    if job["status"] == "succeeded":
+                        # The user's previous upload, if any, was replaced
+                        get_upload_registry().forget(user_id)
+
+                job_id = get_ingest_jobs().submit(
+                    user_id, file_path, on_complete=on_complete
+                )
+                return (
+                    jsonify(
+                        {
+                            "success": "Database load queued",
+                            "job_id": job_id,
+                            "status_url": f"/load_db/status/{job_id}",
+                        }
+                    ),
+                    202,
+                )
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
         else:
@@ -32,6 +170,121 @@ def load_db():
         return jsonify({"error": "Missing required parameters"}), 400
 
 
+@app.route("/upload", methods=["POST"])
+def upload():
+    user_id = request.form.get("user_id")
+    storage = request.files.get("file")
+    if not (user_id and storage and storage.filename):
+        return jsonify({"error": "Missing required parameters"}), 400
+
+    filename = os.path.basename(storage.filename)
+    file_extension = filename.split(".")[-1].lower()
+    if file_extension not in DOCUMENT_UPLOAD_FORMATS + SPREADSHEET_UPLOAD_FORMATS:
+        return jsonify({"error": "Unsupported file type"}), 400
+
+    spool = storage.stream
+    if not isinstance(spool, HashingSpool):
+        spool = HashingSpool()
+        shutil.copyfileobj(storage.stream, spool)
+    # Flask closes the request's files when it ends, the spool is ours now
+    storage.stream = io.BytesIO()
+    digest = spool.hexdigest()
+
+    try:
+        if file_extension in SPREADSHEET_UPLOAD_FORMATS:
+            sheet_name = request.form.get("sheet_name", 0)
+            try:
+                sheet_name = int(sheet_name)
+            except ValueError:
+                pass
+            try:
+                get_excel_bot_cache().get_upload(
+                    digest, filename, sheet_name=sheet_name, fileobj=spool
+                )
+            finally:
+                spool.close()
+            return (
+                jsonify(
+                    {
+                        "success": "Spreadsheet loaded",
+                        "upload_id": digest,
+                        "bytes": spool.size,
+                    }
+                ),
+                200,
+            )
+
+        registry = get_upload_registry()
+        owners = registry.owners(digest)
+        if user_id in owners:
+            spool.close()
+            return (
+                jsonify(
+                    {
+                        "success": "Document already loaded",
+                        "upload_id": digest,
+                        "deduplicated": True,
+                    }
+                ),
+                200,
+            )
+        for owner_id in owners:
+            # Same bytes already ingested for someone else, copy their chunks
+            stats = get_rag().attach_document(
+                user_id, owner_id, digest, source=filename
+            )
+            if stats is not None:
+                spool.close()
+                registry.record(digest, user_id, filename)
+                return (
+                    jsonify(
+                        {
+                            "success": "Database loaded",
+                            "upload_id": digest,
+                            "deduplicated": True,
+                            "stats": stats,
+                        }
+                    ),
+                    200,
+                )
+            registry.forget(owner_id, digest)
+
+        def on_complete(job):
+            spool.close()
+            if job["status"] == "succeeded":
+                registry.record(digest, user_id, filename)
+
+        job_id = get_ingest_jobs().submit(
+            user_id,
+            filename,
+            on_complete=on_complete,
+            fileobj=spool,
+            content_digest=digest,
+        )
+        return (
+            jsonify(
+                {
+                    "success": "Database load queued",
+                    "upload_id": digest,
+                    "job_id": job_id,
+                    "status_url": f"/load_db/status/{job_id}",
+                }
+            ),
+            202,
+        )
+    except Exception as e:
+        spool.close()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/load_db/status/<job_id>", methods=["GET"])
+def load_db_status(job_id):
+    job = get_ingest_jobs().status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job), 200
+
+
 @app.route("/pdf_invoke", methods=["POST"])
 def pdf_invoke():
     data: dict = request.get_json()
@@ -40,15 +293,84 @@ def pdf_invoke():
 
     if user_id and query:
         try:
-            rag_model = RAG()
+            rag_model = get_rag()
             answer = rag_model.invoke(user_id=user_id, query=query)
-            return jsonify({"answer": answer}), 200
+            return jsonify({"answer": answer, "context": rag_model.context_stats}), 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    else:
+        return jsonify({"error": "Missing required parameters"}), 400
+
+
+@app.route("/pdf_invoke_batch", methods=["POST"])
+def pdf_invoke_batch():
+    data: dict = request.get_json()
+    user_id = data.get("user_id")
+    queries = data.get("queries")
+    max_queries = int(os.getenv("BATCH_MAX_QUERIES", 100))
+    max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", 4))
+
+    if user_id and queries and isinstance(queries, list):
+        if len(queries) > max_queries:
+            return jsonify({"error": f"At most {max_queries} queries per batch"}), 400
+        requested = data.get("max_concurrency")
+        if requested is None:
+            requested = max_concurrency
+        try:
+            if isinstance(requested, (bool, float)):
+                raise ValueError(requested)
+            requested = int(requested)
+        except (TypeError, ValueError):
+            return jsonify({"error": "max_concurrency must be an integer"}), 400
+        try:
+            results = get_rag().invoke_many(
+                user_id=user_id,
+                queries=queries,
+                # Callers may lower the fan-out, never raise it past the limit
+                max_workers=max(1, min(requested, max_concurrency)),
+            )
+            return jsonify({"results": results}), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     else:
         return jsonify({"error": "Missing required parameters"}), 400
 
 
+def sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@app.route("/pdf_invoke/stream", methods=["POST"])
+def pdf_invoke_stream():
+    data: dict = request.get_json()
+    user_id = data.get("user_id")
+    query = data.get("query")
+
+    if not (user_id and query):
+        return jsonify({"error": "Missing required parameters"}), 400
+
+    def events():
+        rag_model = get_rag()
+        timings = {}
+        try:
+            for token in rag_model.stream(user_id, query, timings=timings):
+                yield sse({"token": token})
+            yield sse(
+                {"timings": timings, "context": rag_model.context_stats},
+                event="done",
+            )
+        except Exception as e:
+            yield sse({"error": str(e)}, event="error")
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        # Keep reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/delete_db", methods=["POST"])
 def delete_db():
     data: dict = request.get_json()
@@ -56,8 +378,9 @@ def delete_db():
 
     if user_id:
         try:
-            rag_model = RAG()
-            rag_model.delete_db(user_id)
+            # Straight to the registry, deleting needs no model clients
+            get_session_registry().delete_tenant(user_id)
+            get_upload_registry().forget(user_id)
             return jsonify({"success": "Database deleted successfully"}), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
@@ -70,26 +393,66 @@ def excel_invoke():
     data: dict = request.get_json()
     query: str = data.get("query")
     file_path: str = data.get("file_path")
+    upload_id: str = data.get("upload_id")
     sheet_name: str | int = data.get("sheet_name", 0)
+    low_latency: bool = data.get(
+        "low_latency", os.getenv("EXCEL_LOW_LATENCY", "0") == "1"
+    )
+    backend: str = data.get("backend", os.getenv("EXCEL_BACKEND", "pandas"))
+    chart_encoding: str = data.get("chart_encoding", "json")
 
-    if file_path and query:
+    if (file_path or upload_id) and query:
         try:
-            if file_path.endswith(".csv"):
-                excelbot = ExcelBot(file_path=file_path)
+            if upload_id:
+                try:
+                    sheet_name = int(sheet_name)
+                except (TypeError, ValueError):
+                    pass
+                # Rebuilt from the columnar cache if the bot was evicted
+                excelbot = get_excel_bot_cache().get_upload(
+                    upload_id, file_path or upload_id, sheet_name=sheet_name
+                )
+            elif file_path.endswith(".csv"):
+                excelbot = get_excel_bot_cache().get(file_path, backend=backend)
             elif file_path.endswith(".xlsx") or file_path.endswith(".xls"):
                 try:
                     sheet_name = int(sheet_name)
                 except:
                     pass
-                excelbot = ExcelBot(file_path=file_path, sheet_name=sheet_name)
+                excelbot = get_excel_bot_cache().get(
+                    file_path, sheet_name=sheet_name, backend=backend
+                )
+
+            timings = {}
+            output = excelbot.excel_invoke(
+                query,
+                low_latency=low_latency,
+                timings=timings,
+                chart_encoding=chart_encoding,
+            )
+            from data.chart_payload import render_json
 
-            output = excelbot.excel_invoke(query)
-            return jsonify({"output": output}), 200
+            # The chart body is already JSON text, it is not encoded twice
+            body = render_json({"output": output, "timings": timings}, app.json.dumps)
+            return Response(body, mimetype="application/json"), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     else:
         return jsonify({"error": "Missing required parameters"}), 400
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    body = (
+        get_tracer().render_prometheus()
+        + render_gauges("rag_sessions", get_session_registry().stats())
+        + render_gauges("excel_bot_cache", get_excel_bot_cache().stats())
+        + render_gauges("response_cache", get_response_cache().stats())
+    )
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
+    # Sampled spans (TRACE_SAMPLE_RATE) are logged as JSON lines
+    logging.basicConfig(level=logging.INFO)
     app.run(debug=True)
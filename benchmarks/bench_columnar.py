@@ -0,0 +1,74 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data.excel_model import ExcelBot
+from data.columnar import ColumnarCache
+import numpy as np
+import pandas as pd
+import argparse
+import tempfile
+import json
+import time
+
+
+def make_workbook(path: str, rows: int, cols: int) -> None:
+    rng = np.random.default_rng(0)
+    data = {
+        f"metric_{i}": rng.normal(size=rows).round(3) for i in range(cols - 2)
+    }
+    data["region"] = rng.choice(["East", "West", "North", "South"], size=rows)
+    data["product"] = rng.choice([f"P{i}" for i in range(50)], size=rows)
+    if path.endswith(".csv"):
+        pd.DataFrame(data).to_csv(path, index=False)
+    else:
+        pd.DataFrame(data).to_excel(path, index=False)
+
+
+def cold_parse(path: str) -> pd.DataFrame:
+    # load_excel_file and clean_dataframe_columns do not touch instance state
+    parser = ExcelBot.__new__(ExcelBot)
+    return parser.clean_dataframe_columns(parser.load_excel_file(path))
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare cold spreadsheet parsing with Parquet cache loads."
+    )
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--cols", type=int, default=20)
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, f"bench.{args.format}")
+        make_workbook(path, args.rows, args.cols)
+        cache = ColumnarCache(cache_dir=os.path.join(tmp_dir, "cache"))
+        cache.store("bench", cold_parse(path))
+
+        results = {
+            "rows": args.rows,
+            "cols": args.cols,
+            "format": args.format,
+            "file_bytes": os.path.getsize(path),
+            "parquet_bytes": os.path.getsize(cache.path("bench")),
+            "cold_parse_s": best_of(lambda: cold_parse(path), args.repeat),
+            "cached_load_s": best_of(lambda: cache.load("bench"), args.repeat),
+        }
+        results["speedup"] = results["cold_parse_s"] / results["cached_load_s"]
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+import numpy as np
+import subprocess
+import argparse
+import json
+import time
+
+DEFAULT_MODULES = ["api.main", "data.session", "data.model", "data.excel_model"]
+
+
+def import_once(module: str) -> tuple[float, list[tuple[int, str]]]:
+    """Import `module` in a fresh interpreter, like a worker booting."""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    env.pop("API_WARM_UP", None)
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=env,
+    )
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    # "import time: self [us] | cumulative | imported package"
+    cumulative = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):  # top-level imports only
+            cumulative.append((int(total), name.strip()))
+    return elapsed, cumulative
+
+
+def bench_module(module: str, runs: int, top: int) -> dict:
+    walls, slowest = [], {}
+    for _ in range(runs):
+        elapsed, cumulative = import_once(module)
+        walls.append(elapsed)
+        for micros, name in cumulative:
+            slowest[name] = max(slowest.get(name, 0), micros)
+    values = np.array(walls) * 1000
+    ranked = sorted(slowest.items(), key=lambda item: -item[1])[:top]
+    return {
+        "runs": runs,
+        "wall_p50_ms": round(float(np.percentile(values, 50)), 1),
+        "wall_min_ms": round(float(values.min()), 1),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in ranked},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure cold-start import time of the API and its subsystems."
+    )
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="Write the results JSON here.")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "modules": {}}
+    for module in args.modules:
+        try:
+            results["modules"][module] = bench_module(module, args.runs, args.top)
+        except RuntimeError as e:
+            results["modules"][module] = {"error": str(e)}
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
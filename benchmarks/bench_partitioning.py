@@ -0,0 +1,93 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data.partition import TenantPartitioner
+import numpy as np
+import chromadb
+import argparse
+import tempfile
+import json
+import time
+
+
+def percentiles(samples: list[float]) -> dict:
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def run_layout(mode: str, args, rng) -> dict:
+    with tempfile.TemporaryDirectory() as persist_dir:
+        client = chromadb.PersistentClient(path=persist_dir)
+        partitioner = TenantPartitioner(mode=mode, buckets=args.buckets)
+        user_ids = [f"user-{i}" for i in range(args.tenants)]
+
+        start = time.perf_counter()
+        for user_id in user_ids:
+            collection = client.get_or_create_collection(
+                partitioner.collection_name(user_id)
+            )
+            collection.add(
+                ids=[f"{user_id}-{j}" for j in range(args.chunks)],
+                embeddings=rng.normal(size=(args.chunks, args.dim)).tolist(),
+                metadatas=[{"user_id": user_id}] * args.chunks,
+                documents=["chunk"] * args.chunks,
+            )
+        load_s = time.perf_counter() - start
+
+        sample_size = min(args.samples, len(user_ids))
+        sample = [str(u) for u in rng.choice(user_ids, size=sample_size, replace=False)]
+        query_latencies = []
+        for user_id in sample:
+            collection = client.get_collection(partitioner.collection_name(user_id))
+            where = partitioner.search_kwargs(user_id).get("filter")
+            start = time.perf_counter()
+            collection.query(
+                query_embeddings=rng.normal(size=(1, args.dim)).tolist(),
+                n_results=4,
+                where=where,
+            )
+            query_latencies.append(time.perf_counter() - start)
+
+        delete_latencies = []
+        for user_id in sample:
+            start = time.perf_counter()
+            partitioner.delete_tenant(client, user_id)
+            delete_latencies.append(time.perf_counter() - start)
+
+        return {
+            "mode": mode,
+            "load_s": round(load_s, 3),
+            "query": percentiles(query_latencies),
+            "delete": percentiles(delete_latencies),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare query and tenant-delete latency across vector layouts."
+    )
+    parser.add_argument("--tenants", type=int, default=10_000)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--buckets", type=int, default=64)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["shared", "tenant", "bucket"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = {
+        "tenants": args.tenants,
+        "chunks_per_tenant": args.chunks,
+        "layouts": [run_layout(mode, args, rng) for mode in args.modes],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
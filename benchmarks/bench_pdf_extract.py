@@ -0,0 +1,70 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.corpora import write_pdf
+from data.pdf_extract import PDFExtractor, page_count
+import argparse
+import tempfile
+import json
+import time
+
+
+def pages_per_second(extractor: PDFExtractor, path: str, repeat: int) -> dict:
+    timings, pages = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = sum(1 for _ in extractor.iter_pages(path))
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {"seconds": round(best, 4), "pages_per_s": round(pages / best, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare single-process and multi-process PDF text extraction."
+    )
+    parser.add_argument("--pages", type=int, default=1_000)
+    parser.add_argument("--lines-per-page", type=int, default=40)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1]
+    )
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_pdf(
+            os.path.join(tmp_dir, "bench.pdf"), args.pages, args.lines_per_page
+        )
+        results = {
+            "cpu_count": os.cpu_count(),
+            "pages": args.pages,
+            "file_bytes": os.path.getsize(path),
+            "single_process": pages_per_second(
+                PDFExtractor(workers=1), path, args.repeat
+            ),
+        }
+        for workers in sorted(set(args.workers)):
+            if workers <= 1:
+                continue
+            extractor = PDFExtractor(
+                workers=workers, pages_per_task=args.pages_per_task, min_pages=1
+            )
+            try:
+                # Start the workers (and their imports) first, as a long-lived
+                # server would have
+                list(extractor.get_pool().map(page_count, [path] * workers))
+                result = pages_per_second(extractor, path, args.repeat)
+            finally:
+                extractor.shutdown()
+            result["speedup"] = round(
+                results["single_process"]["seconds"] / result["seconds"], 2
+            )
+            results[f"workers_{workers}"] = result
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.corpora import make_frame
+from data.profile import profile_dataframe
+import pandas as pd
+import argparse
+import json
+import time
+
+SHAPES = [(100, 100), (2_000, 300), (300_000, 30), (1_000_000, 10)]
+
+
+def legacy_metadata(df: pd.DataFrame) -> tuple:
+    """What ExcelBot.create_metadata computed before the profiler existed."""
+    column_value_pairs = {}
+    for column in df.columns:
+        if df[column].nunique() <= 15:
+            column_value_pairs[column] = df[column].unique().tolist()
+    return str(column_value_pairs), str(list(df.columns)), str(df.head())
+
+
+def best_of(fns: list, repeat: int) -> list[float]:
+    """Best time of each function, interleaved so machine noise hits both."""
+    timings = [[] for _ in fns]
+    for _ in range(repeat):
+        for fn, samples in zip(fns, timings):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    return [min(samples) for samples in timings]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the cold column profiler with the old create_metadata."
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for rows, cols in SHAPES:
+        df = make_frame(rows, cols)
+        legacy, profiled = best_of(
+            [lambda: legacy_metadata(df), lambda: profile_dataframe(df)], args.repeat
+        )
+        results.append(
+            {
+                "rows": rows,
+                "cols": df.shape[1],
+                "legacy_s": round(legacy, 4),
+                "profile_s": round(profiled, 4),
+                "ratio": round(profiled / legacy, 2),
+                "same_column_values": legacy_metadata(df)[0]
+                == profile_dataframe(df)["column_value_pairs"],
+            }
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
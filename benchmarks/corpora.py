@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import os
+
+WORDS = (
+    "revenue forecast policy employee benefit region quarter handbook section "
+    "procedure safety customer contract renewal invoice approval manager budget "
+    "travel expense compliance audit training schedule inventory supplier quality"
+).split()
+
+SIZES = {
+    "small": {"pages": 10, "rows": 2_000, "cols": 10, "wide_cols": 100},
+    "medium": {"pages": 100, "rows": 50_000, "cols": 20, "wide_cols": 300},
+    "large": {"pages": 1_000, "rows": 500_000, "cols": 30, "wide_cols": 1_000},
+}
+
+
+def paragraphs(rng, count: int, words: int = 80) -> list[str]:
+    return [" ".join(rng.choice(WORDS, size=words)) + "." for _ in range(count)]
+
+
+def write_text(path: str, pages: int, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as fp:
+        fp.write("\n\n".join(paragraphs(rng, pages * 4)))
+    return path
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 40, seed: int = 0) -> str:
+    """Write a plain-text PDF with Helvetica text, readable by pypdf."""
+    rng = np.random.default_rng(seed)
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] "
+        f"/Count {pages} >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    for page_number, page_id in enumerate(page_ids):
+        lines = [f"Page {page_number + 1}"] + [
+            " ".join(rng.choice(WORDS, size=12)) for _ in range(lines_per_page)
+        ]
+        text = " ".join(f"({_escape(line)}) '" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 780 Td {text} ET"
+        objects[page_id] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        )
+        objects[page_id + 1] = (
+            f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+        )
+
+    body = b"%PDF-1.4\n"
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(body)
+        body += f"{object_id} 0 obj\n{objects[object_id]}\nendobj\n".encode("latin-1")
+    xref_offset = len(body)
+    count = max(objects) + 1
+    xref = [f"xref\n0 {count}\n", "0000000000 65535 f \n"]
+    xref += [f"{offsets[i]:010d} 00000 n \n" for i in range(1, count)]
+    body += "".join(xref).encode("latin-1")
+    body += (
+        f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+    with open(path, "wb") as fp:
+        fp.write(body)
+    return path
+
+
+def make_frame(rows: int, cols: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {
+        "Region": rng.choice(["East", "West", "North", "South"], size=rows),
+        "Product": rng.choice([f"P{i:03d}" for i in range(200)], size=rows),
+        "Date": pd.Timestamp("2024-01-01")
+        + pd.to_timedelta(rng.integers(0, 365, size=rows), unit="D"),
+    }
+    for i in range(max(cols - len(data), 0)):
+        data[f"Metric {i}"] = rng.normal(100, 25, size=rows).round(2)
+    return pd.DataFrame(data)
+
+
+def write_spreadsheet(path: str, df: pd.DataFrame) -> str:
+    if path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+
+def write_multi_header(path: str, rows: int, cols: int, seed: int = 0) -> str:
+    """A sheet whose header spans two rows, like exported pivot reports."""
+    df = make_frame(rows, cols, seed)
+    groups = ["Dimensions"] * 3 + ["Measures"] * (df.shape[1] - 3)
+    df.columns = pd.MultiIndex.from_arrays([groups, list(df.columns)])
+    df.to_excel(path)
+    return path
+
+
+def build_corpus(directory: str, size: str) -> dict:
+    spec = SIZES[size]
+    os.makedirs(directory, exist_ok=True)
+    tall_rows = spec["rows"]
+    return {
+        "pdf": write_pdf(os.path.join(directory, f"{size}.pdf"), spec["pages"]),
+        "txt": write_text(os.path.join(directory, f"{size}.txt"), spec["pages"]),
+        "tall": write_spreadsheet(
+            os.path.join(directory, f"{size}_tall.csv"),
+            make_frame(tall_rows, spec["cols"]),
+        ),
+        "wide": write_spreadsheet(
+            os.path.join(directory, f"{size}_wide.xlsx"),
+            make_frame(max(tall_rows // 50, 100), spec["wide_cols"]),
+        ),
+        "multi_header": write_multi_header(
+            os.path.join(directory, f"{size}_multi_header.xlsx"),
+            max(tall_rows // 50, 100),
+            spec["cols"],
+        ),
+    }
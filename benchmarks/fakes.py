@@ -0,0 +1,98 @@
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from typing import Any, List, Optional
+import numpy as np
+import hashlib
+import time
+import re
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash-seeded vectors, no network calls."""
+
+    def __init__(self, size: int = 256, latency_ms: float = 0.0) -> None:
+        self.size = size
+        self.latency_ms = latency_ms
+        self.model = f"fake-embedding-{size}"
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        seed = int.from_bytes(digest[:8], "big")
+        vector = np.random.default_rng(seed).normal(size=self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _wait(self) -> None:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._wait()
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._wait()
+        return self._embed(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model that answers the prompts this repo sends.
+
+    It returns a refined query naming a real column, "No" to visualization
+    checks, a pandas code block for pandasai, and a short canned answer for
+    document Q&A. `latency_ms` emulates the provider round-trip.
+    """
+
+    latency_ms: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def respond(self, prompt: str) -> str:
+        if "Is a visualization requested" in prompt:
+            return "No"
+        if "dfs[0]" in prompt or "```python" in prompt:
+            return (
+                "```python\n"
+                "result = {'type': 'number', 'value': len(dfs[0])}\n"
+                "```"
+            )
+        if "Refined Query" in prompt:
+            return self.refine(prompt)
+        if "SQL" in prompt:
+            return "SELECT count(*) FROM data"
+        return f"Fake answer based on {len(prompt)} prompt characters."
+
+    def refine(self, prompt: str) -> str:
+        match = re.search(r"Columns: \[([^\]]*)\]", prompt)
+        column = match.group(1).split(",")[0].strip(" '\"") if match else "value"
+        return f"Select '{column}' column. Count the rows."
+
+    def with_structured_output(self, schema, **kwargs):
+        def structured(messages) -> Any:
+            self.calls += 1
+            prompt = "\n".join(str(message.content) for message in messages)
+            return schema(refined_query=self.refine(prompt), is_visualization=False)
+
+        return RunnableLambda(structured)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        prompt = "\n".join(str(message.content) for message in messages)
+        message = AIMessage(content=self.respond(prompt))
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,273 @@
+import os
+import sys
+import tempfile
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Keep every on-disk cache out of the working tree, and cold per run
+WORK_DIR = tempfile.mkdtemp(prefix="pdfexcel-bench-")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(WORK_DIR, "embedding_cache.db")
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(WORK_DIR, "response_cache.db")
+os.environ["PROFILE_CACHE_DIR"] = os.path.join(WORK_DIR, "profiles")
+os.environ["COLUMNAR_CACHE_DIR"] = os.path.join(WORK_DIR, "columnar")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+from benchmarks.corpora import SIZES, build_corpus
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from data.excel_model import ExcelBot
+from data.ingest import DocLoader
+from data.model import RAG
+from data.profile import profile_dataframe
+from data.response_cache import ResponseCache
+from data.session import SessionRegistry
+import numpy as np
+import subprocess
+import tracemalloc
+import argparse
+import shutil
+import json
+import time
+
+QUERIES = [
+    "What does the policy say about travel expense approval?",
+    "Summarize the budget section.",
+    "Who approves supplier contract renewals?",
+    "What is the training schedule for new employees?",
+    "How are invoices audited each quarter?",
+]
+
+EXCEL_QUERIES = [
+    "How many rows are there?",
+    "What is the average of the first metric by region?",
+    "Which product has the highest total?",
+]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn, iterations: int, units_per_call: float = 1.0) -> dict:
+    """Call `fn(i)` repeatedly and summarize latency, throughput and peak memory."""
+    latencies = []
+    tracemalloc.start()
+    try:
+        for i in range(iterations):
+            start = time.perf_counter()
+            fn(i)
+            latencies.append(time.perf_counter() - start)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    values = np.array(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        "iterations": iterations,
+        "mean_ms": round(float(np.mean(values)), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "throughput_per_s": round(units_per_call * iterations / total, 3)
+        if total
+        else None,
+        "peak_memory_mb": round(peak / 2**20, 3),
+    }
+
+
+def fake_registry(args, persist_dir: str) -> SessionRegistry:
+    return SessionRegistry(
+        persist_directory=persist_dir,
+        llm_factory=lambda model: FakeChatModel(latency_ms=args.llm_latency_ms),
+        embeddings=FakeEmbeddings(latency_ms=args.embedding_latency_ms),
+    )
+
+
+def bench_ingest(args, corpus: dict, kind: str) -> dict:
+    registry = fake_registry(args, os.path.join(WORK_DIR, f"chroma_ingest_{kind}"))
+
+    def ingest(i):
+        # A fresh user each time, so every run embeds and indexes from scratch
+        # (the content-addressed embedding cache still hits after the first)
+        return DocLoader(
+            user_id=f"bench-ingest-{i}",
+            api_key=None,
+            file_path=corpus[kind],
+            persist_dir=registry.persist_directory,
+            embeddings=registry.get_embeddings(),
+            vectorstore=registry.get_vectorstore(),
+        )()
+
+    stats = ingest(-1)
+    result = measure(ingest, args.ingest_iterations)
+    result["chunks"] = stats["chunks"]["added"] + stats["chunks"]["kept"]
+    result["pages"] = stats["pages"]
+    return result
+
+
+def bench_rag_invoke(args, corpus: dict) -> dict:
+    registry = fake_registry(args, os.path.join(WORK_DIR, "chroma_rag"))
+    rag = RAG(registry=registry)
+    rag.load_db(corpus["pdf"], "bench-rag")
+
+    def invoke(i):
+        # Vary the wording so the response cache only hits on repeats
+        rag.invoke("bench-rag", f"{QUERIES[i % len(QUERIES)]} ({i % 7})")
+
+    return measure(invoke, args.iterations)
+
+
+def bench_excel_load(args, corpus: dict, kind: str) -> dict:
+    parser = ExcelBot.__new__(ExcelBot)
+
+    def load(i):
+        parser.clean_dataframe_columns(parser.load_excel_file(corpus[kind]))
+
+    df = parser.load_excel_file(corpus[kind])
+    result = measure(load, args.excel_iterations)
+    result["rows"], result["columns"] = df.shape
+    return result
+
+
+def bench_create_metadata(args, corpus: dict, kind: str) -> dict:
+    parser = ExcelBot.__new__(ExcelBot)
+    df = parser.clean_dataframe_columns(parser.load_excel_file(corpus[kind]))
+    # profile_dataframe is what create_metadata runs on a sidecar miss
+    return measure(lambda i: profile_dataframe(df), args.excel_iterations)
+
+
+def bench_excel_invoke(args, corpus: dict) -> dict:
+    bot = ExcelBot(
+        corpus["tall"],
+        llm=FakeChatModel(latency_ms=args.llm_latency_ms),
+        response_cache=ResponseCache(),
+    )
+
+    def invoke(i):
+        bot.excel_invoke(f"{EXCEL_QUERIES[i % len(EXCEL_QUERIES)]} ({i})")
+
+    return measure(invoke, args.iterations)
+
+
+def run_scenarios(args, corpus: dict) -> dict:
+    scenarios = {
+        "ingest_pdf": lambda: bench_ingest(args, corpus, "pdf"),
+        "ingest_txt": lambda: bench_ingest(args, corpus, "txt"),
+        "rag_invoke": lambda: bench_rag_invoke(args, corpus),
+        "excel_invoke": lambda: bench_excel_invoke(args, corpus),
+    }
+    for kind in ("tall", "wide", "multi_header"):
+        scenarios[f"excel_load_{kind}"] = (
+            lambda kind=kind: bench_excel_load(args, corpus, kind)
+        )
+        scenarios[f"create_metadata_{kind}"] = (
+            lambda kind=kind: bench_create_metadata(args, corpus, kind)
+        )
+
+    results = {}
+    for name, scenario in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        print(f"running {name}...", file=sys.stderr)
+        try:
+            results[name] = scenario()
+        except Exception as e:
+            # One broken scenario (e.g. a missing optional loader) should not
+            # lose the rest of the run
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """List scenarios whose p50 or peak memory grew by more than `threshold`."""
+    regressions = []
+    for size, scenarios in current["sizes"].items():
+        for name, result in scenarios.items():
+            previous = baseline.get("sizes", {}).get(size, {}).get(name)
+            if not previous or "error" in previous or "error" in result:
+                continue
+            for metric in ("p50_ms", "peak_memory_mb"):
+                before, after = previous.get(metric), result.get(metric)
+                if before and after and after > before * (1 + threshold):
+                    regressions.append(
+                        {
+                            "size": size,
+                            "scenario": name,
+                            "metric": metric,
+                            "baseline": before,
+                            "current": after,
+                            "change": round(after / before - 1, 3),
+                        }
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks for ingestion, retrieval and ExcelBot, "
+        "using deterministic fake models instead of OpenAI."
+    )
+    parser.add_argument("--sizes", nargs="+", default=["small"], choices=list(SIZES))
+    parser.add_argument("--only", nargs="*", help="Scenario names to run.")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--ingest-iterations", type=int, default=3)
+    parser.add_argument("--excel-iterations", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the results JSON here.")
+    parser.add_argument("--baseline", help="Results JSON to compare against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative growth that counts as a regression (default 0.2).",
+    )
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "iterations": args.iterations,
+            "llm_latency_ms": args.llm_latency_ms,
+            "embedding_latency_ms": args.embedding_latency_ms,
+        },
+        "sizes": {},
+    }
+    try:
+        for size in args.sizes:
+            corpus = build_corpus(os.path.join(WORK_DIR, "corpus", size), size)
+            results["sizes"][size] = run_scenarios(args, corpus)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        results["baseline_commit"] = baseline.get("commit")
+        results["regressions"] = compare(results, baseline, args.threshold)
+        if results["regressions"] and args.fail_on_regression:
+            exit_code = 1
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(output)
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
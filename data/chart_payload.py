@@ -0,0 +1,90 @@
+# chart_payload.py
+import pandas as pd
+from typing import Callable
+import base64
+import gzip
+import json
+import uuid
+import io
+
+ENCODINGS = ("json", "gzip", "arrow")
+
+
+class RawJSON(str):
+    """Already serialized JSON, written into a response by `render_json` as is."""
+
+
+def render_json(document, dumps: Callable[..., str] = json.dumps) -> str:
+    """
+    Serialize `document` with `dumps`, splicing each RawJSON value in verbatim
+    instead of parsing it back and encoding it a second time.
+    """
+    raw_values = []
+    marker = uuid.uuid4().hex
+
+    def replace(value):
+        if isinstance(value, RawJSON):
+            raw_values.append(value)
+            return f"{marker}:{len(raw_values) - 1}"
+        if isinstance(value, dict):
+            return {key: replace(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [replace(item) for item in value]
+        return value
+
+    text = dumps(replace(document))
+    for i, raw in enumerate(raw_values):
+        text = text.replace(f'"{marker}:{i}"', raw, 1)
+    return text
+
+
+def project_chart_frame(df: pd.DataFrame, plot_code: str) -> pd.DataFrame:
+    """Keep only the columns the generated plot code refers to."""
+    used = [
+        column
+        for column in df.columns
+        if f"'{column}'" in plot_code or f'"{column}"' in plot_code
+    ]
+    if not used:
+        return df
+    return df.loc[:, ~df.columns.duplicated()][list(dict.fromkeys(used))]
+
+
+def columnar_json(df: pd.DataFrame) -> str:
+    # Each column is serialized by pandas' C encoder, then stitched together
+    data = ",".join(
+        f"{json.dumps(str(column))}:"
+        + df.iloc[:, i].to_json(orient="values", date_format="iso")
+        for i, column in enumerate(df.columns)
+    )
+    columns = json.dumps([str(column) for column in df.columns])
+    return f'{{"columns":{columns},"rows":{len(df)},"data":{{{data}}}}}'
+
+
+def encode_chart_payload(df: pd.DataFrame, encoding: str = "json") -> dict:
+    """
+    Encode `df` as a compact columnar payload.
+
+    `json` returns {"columns", "rows", "data": {column: [values]}} inline, as
+    RawJSON text for `render_json`, `gzip` returns the same document gzipped
+    and base64 encoded, and `arrow` returns a base64 Arrow IPC stream
+    (requires pyarrow). `bytes` is the size of the body as sent.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unsupported chart encoding: {encoding}")
+
+    if encoding == "arrow":
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        body = base64.b64encode(sink.getvalue()).decode("ascii")
+        return {"encoding": "arrow+base64", "body": body, "bytes": len(body)}
+
+    text = columnar_json(df)
+    if encoding == "gzip":
+        body = base64.b64encode(gzip.compress(text.encode("utf-8"))).decode("ascii")
+        return {"encoding": "gzip+base64", "body": body, "bytes": len(body)}
+    return {"encoding": "json", "body": RawJSON(text), "bytes": len(text)}
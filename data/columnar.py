@@ -0,0 +1,74 @@
+# columnar.py
+import pandas as pd
+import threading
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger("pdfexcel.columnar")
+
+COLUMNAR_VERSION = 1
+
+_pyarrow_available: bool | None = None
+_pyarrow_lock = threading.Lock()
+
+
+def pyarrow_available() -> bool:
+    """Whether pyarrow imports; checked, and reported if missing, once."""
+    global _pyarrow_available
+    with _pyarrow_lock:
+        if _pyarrow_available is None:
+            try:
+                import pyarrow  # noqa: F401
+
+                _pyarrow_available = True
+            except ImportError as e:
+                logger.warning("Columnar cache disabled: %s", e)
+                _pyarrow_available = False
+        return _pyarrow_available
+
+
+class ColumnarCache:
+    """
+    Parquet copies of normalized spreadsheets, keyed by content hash and sheet.
+
+    The stored frame is the output of ExcelBot's normalization (empty rows
+    dropped, headers merged, columns cleaned), so a hit skips parsing entirely.
+    Requires pyarrow; without it every lookup is a miss.
+    """
+
+    def __init__(self, cache_dir: str | None = None) -> None:
+        self.cache_dir = cache_dir or os.getenv(
+            "COLUMNAR_CACHE_DIR", "./.columnar_cache"
+        )
+
+    def path(self, fingerprint: str) -> str:
+        key = hashlib.sha256(f"{COLUMNAR_VERSION}:{fingerprint}".encode("utf-8"))
+        return os.path.join(self.cache_dir, f"{key.hexdigest()}.parquet")
+
+    def load(self, fingerprint: str) -> pd.DataFrame | None:
+        path = self.path(fingerprint)
+        if not os.path.isfile(path) or not pyarrow_available():
+            return None
+        try:
+            return pd.read_parquet(path, engine="pyarrow", memory_map=True)
+        except Exception:
+            logger.warning("Could not read columnar cache %s", path, exc_info=True)
+            return None
+
+    def store(self, fingerprint: str, df: pd.DataFrame) -> str | None:
+        if not pyarrow_available():
+            return None
+        path = self.path(fingerprint)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.to_parquet(tmp_path, engine="pyarrow")
+            os.replace(tmp_path, path)
+            return path
+        except Exception as e:
+            # Mixed-type object columns just skip the cache
+            logger.info("Not caching %s as Parquet: %s", fingerprint, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
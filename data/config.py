@@ -0,0 +1,28 @@
+# config.py
+import threading
+import os
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure() -> None:
+    """
+    Load `.env` and apply process-wide LangChain settings, once.
+
+    Called by the entry points and model constructors rather than at import,
+    so importing a module never has side effects. Full LangChain debug output
+    is opt-in through LANGCHAIN_DEBUG=1.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        from dotenv import load_dotenv
+
+        load_dotenv(override=True)
+        if os.getenv("LANGCHAIN_DEBUG", "0") == "1":
+            from langchain.globals import set_debug
+
+            set_debug(True)
+        _configured = True
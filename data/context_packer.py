@@ -0,0 +1,214 @@
+# context_packer.py
+from langchain_core.documents import Document
+from typing import List
+import threading
+import logging
+import re
+import os
+
+logger = logging.getLogger("pdfexcel.context")
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency, falls back to ~4 characters a token
+    tiktoken = None
+
+WORD = re.compile(r"\w+")
+
+_encodings: dict = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str):
+    """The model's tiktoken encoding, loaded once per process; None if unavailable."""
+    with _encodings_lock:
+        if model not in _encodings:
+            encoding = None
+            if tiktoken is not None:
+                try:
+                    try:
+                        encoding = tiktoken.encoding_for_model(model)
+                    except KeyError:  # model unknown to this tiktoken version
+                        encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    # The BPE file is fetched on first use; offline, estimate.
+                    # The None is cached too, so this is logged once per model
+                    logger.warning(
+                        "No tiktoken encoding for %s, estimating tokens: %s",
+                        model,
+                        e,
+                    )
+            _encodings[model] = encoding
+        return _encodings[model]
+
+
+class ContextPacker:
+    """
+    Trim retrieved chunks to what is worth stuffing into the QA prompt.
+
+    Chunks are taken in retrieval order. Each one first has the text it shares
+    with an already kept chunk removed. The splitter repeats up to
+    `overlap_chars` characters between neighbouring chunks. A chunk whose word
+    shingles are at least `duplicate_threshold` Jaccard-similar to a kept chunk
+    is dropped. With `mmr_lambda` set, the remaining chunks are re-ranked by
+    lexical maximal marginal relevance. If `max_tokens` is set, chunks are
+    then added until that budget is reached, counted with the model's tiktoken
+    encoding.
+
+    By default (CONTEXT_FETCH_K=4, no CONTEXT_MAX_TOKENS) the prompt gets the
+    same four chunks the retriever always returned, minus repeated text only.
+    A budget trims it further and is opt-in.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int | None = None,
+        fetch_k: int | None = None,
+        mmr_lambda: float | None = None,
+        duplicate_threshold: float = 0.8,
+        shingle_size: int = 5,
+        overlap_chars: int = 200,
+        min_overlap_chars: int = 40,
+        model: str = "gpt-4o-mini",
+    ) -> None:
+        if max_tokens is None and os.getenv("CONTEXT_MAX_TOKENS"):
+            max_tokens = int(os.getenv("CONTEXT_MAX_TOKENS"))
+        self.max_tokens = max_tokens
+        # With a budget, retrieve a few more candidates than it fits, then pack
+        self.fetch_k = fetch_k or int(os.getenv("CONTEXT_FETCH_K", 4))
+        if mmr_lambda is None and os.getenv("CONTEXT_MMR_LAMBDA"):
+            mmr_lambda = float(os.getenv("CONTEXT_MMR_LAMBDA"))
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.shingle_size = shingle_size
+        self.overlap_chars = overlap_chars
+        self.min_overlap_chars = min_overlap_chars
+        self.model = model
+
+    @property
+    def encoding(self):
+        return get_encoding(self.model)
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if self.encoding is None:
+            return text[: max_tokens * 4]
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(tokens[:max_tokens])
+
+    def strip_overlap(self, kept: str, text: str) -> str:
+        """Remove the splitter overlap `text` shares with a neighbouring chunk."""
+        longest = min(self.overlap_chars, len(kept), len(text))
+        for size in range(longest, self.min_overlap_chars - 1, -1):
+            if kept.endswith(text[:size]):
+                return text[size:].lstrip()
+            if text.endswith(kept[:size]):
+                return text[:-size].rstrip()
+        return text
+
+    def shingles(self, text: str) -> set:
+        words = WORD.findall(text.lower())
+        if len(words) < self.shingle_size:
+            return {tuple(words)}
+        return {
+            tuple(words[i : i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    @staticmethod
+    def jaccard(a: set, b: set) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    def mmr(self, query: str, docs: List[Document]) -> List[Document]:
+        """Greedy lexical MMR; relevance blends retrieval rank and query terms."""
+        query_words = set(WORD.findall(query.lower()))
+        words = [set(WORD.findall(doc.page_content.lower())) for doc in docs]
+        relevance = []
+        for rank, doc_words in enumerate(words):
+            coverage = len(query_words & doc_words) / max(len(query_words), 1)
+            relevance.append(0.5 * (1 - rank / len(docs)) + 0.5 * coverage)
+
+        def score(i: int) -> float:
+            redundancy = max(
+                (self.jaccard(words[i], words[j]) for j in selected), default=0.0
+            )
+            return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+
+        selected: list[int] = []
+        remaining = list(range(len(docs)))
+        while remaining:
+            best = max(remaining, key=score)
+            selected.append(best)
+            remaining.remove(best)
+        return [docs[i] for i in selected]
+
+    def pack(self, query: str, docs: List[Document]) -> tuple[List[Document], dict]:
+        stats = {
+            "chunks_before": len(docs),
+            "tokens_before": sum(self.count_tokens(doc.page_content) for doc in docs),
+            "duplicates_dropped": 0,
+            "overlap_chars_removed": 0,
+        }
+
+        candidates: list[Document] = []
+        candidate_shingles: list[set] = []
+        for doc in docs:
+            text = doc.page_content
+            for kept in candidates:
+                if kept.metadata.get("source") == doc.metadata.get("source"):
+                    text = self.strip_overlap(kept.page_content, text)
+            stats["overlap_chars_removed"] += len(doc.page_content) - len(text)
+            shingles = self.shingles(text)
+            if not text.strip() or any(
+                self.jaccard(shingles, other) >= self.duplicate_threshold
+                for other in candidate_shingles
+            ):
+                stats["duplicates_dropped"] += 1
+                continue
+            candidates.append(Document(page_content=text, metadata=doc.metadata))
+            candidate_shingles.append(shingles)
+
+        if self.mmr_lambda is not None and len(candidates) > 1:
+            candidates = self.mmr(query, candidates)
+
+        if self.max_tokens is None:
+            tokens = sum(self.count_tokens(doc.page_content) for doc in candidates)
+            stats.update(
+                {
+                    "chunks_after": len(candidates),
+                    "tokens_after": tokens,
+                    "token_budget": None,
+                }
+            )
+            return candidates, stats
+
+        packed: list[Document] = []
+        used = 0
+        for doc in candidates:
+            tokens = self.count_tokens(doc.page_content)
+            if used + tokens > self.max_tokens:
+                if packed:
+                    continue  # a later, shorter chunk may still fit
+                # Never send an empty context; cut the best chunk to the budget
+                doc = Document(
+                    page_content=self.truncate(doc.page_content, self.max_tokens),
+                    metadata=doc.metadata,
+                )
+                tokens = self.count_tokens(doc.page_content)
+            packed.append(doc)
+            used += tokens
+
+        stats.update(
+            {
+                "chunks_after": len(packed),
+                "tokens_after": used,
+                "token_budget": self.max_tokens,
+            }
+        )
+        return packed, stats
@@ -0,0 +1,207 @@
+# duckdb_backend.py
+import pandas as pd
+import json
+import os
+
+try:
+    import duckdb
+except ImportError:  # optional dependency
+    duckdb = None
+
+READERS = {
+    ".csv": "read_csv_auto",
+    ".parquet": "read_parquet",
+}
+
+# Read as numbers or booleans by pandas too; anything else is text to pandas
+NON_TEXT_TYPES = {
+    "BOOLEAN",
+    "TINYINT",
+    "SMALLINT",
+    "INTEGER",
+    "BIGINT",
+    "HUGEINT",
+    "UTINYINT",
+    "USMALLINT",
+    "UINTEGER",
+    "UBIGINT",
+    "FLOAT",
+    "DOUBLE",
+    "DECIMAL",
+}
+
+
+class DuckDBBackend:
+    """
+    Out-of-core access to a CSV or Parquet file through an embedded DuckDB.
+
+    The file is exposed as a view named `data` and scanned lazily. Filters and
+    aggregations in generated SQL are pushed down into the scan, and
+    `memory_limit` bounds DuckDB's working memory (it spills to disk beyond it).
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        memory_limit: str | None = None,
+        max_result_rows: int = 100_000,
+    ) -> None:
+        if duckdb is None:
+            raise ImportError("The duckdb backend requires `pip install duckdb`.")
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in READERS:
+            raise ValueError(f"Unsupported file format for duckdb: {extension}")
+
+        self.file_path = file_path
+        self.max_result_rows = max_result_rows
+        self.conn = duckdb.connect(
+            database=":memory:",
+            config={
+                "memory_limit": memory_limit
+                or os.getenv("DUCKDB_MEMORY_LIMIT", "1GB")
+            },
+        )
+        escaped_path = file_path.replace("'", "''")
+        self.source = f"{READERS[extension]}('{escaped_path}')"
+        self.conn.execute(f"CREATE VIEW raw_data AS SELECT * FROM {self.source}")
+        self.rename_columns({})
+
+    def columns(self) -> list[str]:
+        return [row[0] for row in self.conn.execute("DESCRIBE raw_data").fetchall()]
+
+    def rename_columns(
+        self, mapping: dict, exclude: tuple = (), drop_empty_rows: bool = False
+    ) -> None:
+        """
+        (Re)create the `data` view with columns renamed by `mapping`, without
+        the `exclude` columns and, with `drop_empty_rows`, without the rows
+        whose remaining columns are all NULL.
+        """
+        seen = {}
+        projections, kept = [], []
+        for column in self.columns():
+            if column in exclude:
+                continue
+            kept.append(self.quote(column))
+            name = mapping.get(column, column)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}_{seen[name]}"
+            else:
+                seen[name] = 0
+            projections.append(f'{self.quote(column)} AS {self.quote(name)}')
+        where = ""
+        if drop_empty_rows and kept:
+            where = f" WHERE {self.not_empty(kept)}"
+        self.conn.execute(
+            f"CREATE OR REPLACE VIEW data AS SELECT {', '.join(projections)} "
+            f"FROM raw_data{where}"
+        )
+
+    def not_empty(self, quoted_columns: list[str]) -> str:
+        return "NOT (" + " AND ".join(f"{c} IS NULL" for c in quoted_columns) + ")"
+
+    def is_unique(self, column: str) -> bool:
+        """pandas' `Series.is_unique` for a raw column: NULL counts as one value."""
+        quoted = self.quote(column)
+        return self.conn.execute(
+            f"SELECT count(DISTINCT {quoted}) + (count(*) > count({quoted}))::INT "
+            f"= count(*) FROM raw_data"
+        ).fetchone()[0]
+
+    def first_rows(self, columns: list[str], rows: int = 2) -> pd.DataFrame:
+        """
+        The first `rows` raw rows that are not all NULL over `columns`, with
+        the columns pandas would read as text (dates included) cast to text.
+        """
+        types = {
+            row[0]: row[1]
+            for row in self.conn.execute("DESCRIBE raw_data").fetchall()
+        }
+        projections = []
+        for column in columns:
+            quoted = self.quote(column)
+            if types[column].split("(")[0] in NON_TEXT_TYPES:
+                projections.append(quoted)
+            else:
+                projections.append(f"CAST({quoted} AS VARCHAR) AS {quoted}")
+        quoted_columns = [self.quote(column) for column in columns]
+        return self.conn.execute(
+            f"SELECT {', '.join(projections)} FROM raw_data "
+            f"WHERE {self.not_empty(quoted_columns)} LIMIT {int(rows)}"
+        ).df()
+
+    def quote(self, identifier: str) -> str:
+        return '"' + str(identifier).replace('"', '""') + '"'
+
+    def schema(self) -> list[tuple[str, str]]:
+        return [
+            (row[0], row[1]) for row in self.conn.execute("DESCRIBE data").fetchall()
+        ]
+
+    def row_count(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM data").fetchone()[0]
+
+    def sample(self, rows: int = 10_000) -> pd.DataFrame:
+        cursor = self.conn.cursor()
+        return cursor.execute(
+            f"SELECT * FROM data USING SAMPLE reservoir({int(rows)} ROWS) "
+            "REPEATABLE (0)"
+        ).df()
+
+    def table_references(self, sql: str) -> list[tuple[str, str]]:
+        """
+        (kind, name) of every table the statement reads, from DuckDB's own
+        parse tree; kind is BASE_TABLE or TABLE_FUNCTION. CTE names are left out.
+        """
+        tree = json.loads(
+            self.conn.cursor()
+            .execute("SELECT json_serialize_sql($1::VARCHAR)", [sql])
+            .fetchone()[0]
+        )
+        if tree.get("error") or len(tree.get("statements", [])) != 1:
+            raise ValueError("Only a single SELECT query can be run on the data.")
+
+        references, cte_names = [], set()
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+                continue
+            if not isinstance(node, dict):
+                continue
+            for entry in (node.get("cte_map") or {}).get("map", []):
+                cte_names.add(entry.get("key"))
+            if node.get("type") == "BASE_TABLE":
+                name = node.get("table_name", "")
+                if node.get("catalog_name") or node.get("schema_name") not in (
+                    "",
+                    "main",
+                    None,
+                ):
+                    name = f"{node.get('schema_name')}.{name}"
+                references.append(("BASE_TABLE", name))
+            elif node.get("type") == "TABLE_FUNCTION":
+                function = node.get("function") or {}
+                references.append(("TABLE_FUNCTION", function.get("function_name")))
+            stack.extend(node.values())
+        return [
+            (kind, name)
+            for kind, name in references
+            if not (kind == "BASE_TABLE" and name in cte_names)
+        ]
+
+    def query(self, sql: str) -> pd.DataFrame:
+        sql = sql.strip().rstrip(";").strip()
+        # Generated SQL may only read the `data` view. Anything else (file
+        # readers, `FROM 'path.csv'`, other schemas) would expose the server
+        for kind, name in self.table_references(sql):
+            if kind != "BASE_TABLE" or name != "data":
+                raise ValueError(f"Query may only read the `data` table, not {name}.")
+        # Each thread gets its own cursor; the result size is capped. The
+        # newlines end a trailing `-- comment` before the closing paren
+        cursor = self.conn.cursor()
+        return cursor.execute(
+            f"SELECT * FROM (\n{sql}\n) AS result LIMIT {self.max_result_rows}"
+        ).df()
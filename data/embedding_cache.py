@@ -0,0 +1,172 @@
+# embedding_cache.py
+from langchain_core.embeddings import Embeddings
+from data.fingerprint import normalize_text
+from collections import OrderedDict
+from array import array
+from typing import List
+import threading
+import time
+import hashlib
+import sqlite3
+import os
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper backed by a content-addressed SQLite store.
+
+    Vectors are keyed by sha256(model, text), so identical chunks are embedded
+    once no matter which user or file they came from. Only cache misses are sent
+    to the wrapped embedder, in batches of `batch_size`.
+
+    Query embeddings are kept in a separate in-memory LRU with a TTL, keyed by
+    (model, normalized text), so repeated questions skip the embedding call.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        db_path: str | None = None,
+        batch_size: int = 512,
+        query_cache_size: int = 4096,
+        query_ttl: float = 3600,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.db_path = db_path or os.getenv(
+            "EMBEDDING_CACHE_PATH", "./embedding_cache.db"
+        )
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        self.query_ttl = query_ttl
+        self._queries: OrderedDict = OrderedDict()
+        self._query_lock = threading.Lock()
+        self.query_hits = 0
+        self.query_misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+        self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                )
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+        return found
+
+    def _store(self, items: List[tuple]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in items],
+            )
+            self._conn.commit()
+
+    def embed_documents_with_stats(self, texts: List[str]):
+        keys = [self._key(text) for text in texts]
+        vectors = self._lookup(list(set(keys)))
+        hits = sum(1 for key in keys if key in vectors)
+        bytes_saved = sum(
+            len(text.encode("utf-8"))
+            for key, text in zip(keys, texts)
+            if key in vectors
+        )
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch = missing_keys[start : start + self.batch_size]
+            embedded = self.embeddings.embed_documents([missing[key] for key in batch])
+            self._store(list(zip(batch, embedded)))
+            vectors.update(zip(batch, embedded))
+
+        stats = {
+            "chunks": len(texts),
+            "hits": hits,
+            "misses": len(texts) - hits,
+            "embedded": len(missing_keys),
+            "hit_rate": hits / len(texts) if texts else 0.0,
+            "bytes_saved": bytes_saved,
+        }
+        return [vectors[key] for key in keys], stats
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents_with_stats(texts)[0]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model, normalize_text(text))
+        now = time.monotonic()
+        with self._query_lock:
+            entry = self._queries.get(key)
+            if entry is not None and now - entry[1] <= self.query_ttl:
+                self._queries.move_to_end(key)
+                self.query_hits += 1
+                return entry[0]
+            self.query_misses += 1
+
+        vector = self.embeddings.embed_query(text)
+        with self._query_lock:
+            self._queries[key] = (vector, now)
+            self._queries.move_to_end(key)
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries, sending all cache misses in one request."""
+        keys = [(self.model, normalize_text(text)) for text in texts]
+        now = time.monotonic()
+        vectors: dict = {}
+        with self._query_lock:
+            for key in keys:
+                entry = self._queries.get(key)
+                if entry is not None and now - entry[1] <= self.query_ttl:
+                    self._queries.move_to_end(key)
+                    self.query_hits += 1
+                    vectors[key] = entry[0]
+                else:
+                    self.query_misses += 1
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            with self._query_lock:
+                for key, vector in zip(missing, embedded):
+                    vectors[key] = vector
+                    self._queries[key] = (vector, now)
+                    self._queries.move_to_end(key)
+                while len(self._queries) > self.query_cache_size:
+                    self._queries.popitem(last=False)
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> dict:
+        with self._query_lock:
+            lookups = self.query_hits + self.query_misses
+            return {
+                "query_entries": len(self._queries),
+                "query_hits": self.query_hits,
+                "query_misses": self.query_misses,
+                "query_hit_rate": self.query_hits / lookups if lookups else 0.0,
+            }
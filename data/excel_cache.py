@@ -0,0 +1,195 @@
+# excel_cache.py
+from collections import OrderedDict
+from typing import TYPE_CHECKING, BinaryIO, Union
+import threading
+import os
+
+if TYPE_CHECKING:
+    from data.excel_model import ExcelBot
+
+
+class ExcelBotCache:
+    """
+    Process-wide LRU cache of ready ExcelBot instances.
+
+    Entries are keyed by (absolute path, sheet_name) and remember the file's
+    (mtime, size) fingerprint, so a changed file is re-parsed on the next lookup.
+    Eviction happens once either the entry count or the summed DataFrame memory
+    goes over its limit.
+
+    A cached bot is shared by every concurrent request for that file, so it
+    only holds what is derived from the file: the frame, its profile, prompts
+    and the clients. Per-request values (refined query, timings, generated
+    code, SmartDataframe) stay local to `excel_invoke`.
+    """
+
+    def __init__(self, max_entries: int = 16, max_bytes: int = 2 * 1024**3) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key_path(self, file_path: str) -> str:
+        if file_path.startswith(("http://", "https://")):
+            return file_path
+        return os.path.abspath(file_path)
+
+    def _fingerprint(self, file_path: str) -> tuple:
+        """
+        (fingerprint, fetch result). Remote files are fetched here, once; the
+        result is handed to ExcelBot on a miss so the body is not downloaded
+        a second time.
+        """
+        if os.path.isfile(file_path):
+            stat = os.stat(file_path)
+            return (stat.st_mtime_ns, stat.st_size), None
+        if not file_path.startswith(("http://", "https://")):
+            return None, None
+        from data.fetch import get_fetcher
+
+        # Revalidates against the server; the cached body only changes on a 200
+        fetched = get_fetcher().fetch(file_path)
+        if fetched.path is None:
+            return None, fetched
+        stat = os.stat(fetched.path)
+        return (stat.st_mtime_ns, stat.st_size), fetched
+
+    def _estimate_bytes(self, excelbot: "ExcelBot") -> int:
+        return int(excelbot.clean_df.memory_usage(index=True, deep=True).sum())
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or self.current_bytes > self.max_bytes
+        ):
+            _, (_, _, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+
+    def get(
+        self,
+        file_path: str,
+        sheet_name: Union[str, int] = 0,
+        backend: str = "pandas",
+    ) -> "ExcelBot":
+        fingerprint, fetched = self._fingerprint(file_path)
+        try:
+            return self._get(file_path, sheet_name, backend, fingerprint, fetched)
+        finally:
+            if fetched is not None:
+                fetched.close()
+
+    def _get(self, file_path, sheet_name, backend, fingerprint, fetched) -> "ExcelBot":
+        # pandasai and LangChain load on the first Excel request, not at boot
+        from data.excel_model import ExcelBot
+
+        if fingerprint is None:
+            # Without ETag/Last-Modified there is no way to tell the file changed
+            with self._lock:
+                self.misses += 1
+            return ExcelBot(
+                file_path=file_path,
+                sheet_name=sheet_name,
+                backend=backend,
+                fetched=fetched,
+            )
+
+        key = (self._key_path(file_path), sheet_name, backend)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == fingerprint:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                # File changed on disk since it was cached
+                del self._entries[key]
+                self.current_bytes -= entry[2]
+            self.misses += 1
+
+        excelbot = ExcelBot(
+            file_path=file_path, sheet_name=sheet_name, backend=backend, fetched=fetched
+        )
+        nbytes = self._estimate_bytes(excelbot)
+        if nbytes > self.max_bytes:
+            return excelbot
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+            self._entries[key] = (excelbot, fingerprint, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+        return excelbot
+
+    def get_upload(
+        self,
+        digest: str,
+        filename: str,
+        sheet_name: Union[str, int] = 0,
+        fileobj: BinaryIO | None = None,
+    ) -> "ExcelBot":
+        """
+        ExcelBot for an uploaded spreadsheet, keyed by its content hash.
+
+        Identical bytes uploaded by different users share one entry. Without
+        `fileobj` the bot is rebuilt from the columnar cache, or FileNotFoundError
+        is raised once the upload has been evicted from both.
+        """
+        from data.excel_model import ExcelBot
+
+        key = (f"upload:{digest}", sheet_name, "pandas")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        excelbot = ExcelBot(
+            file_path=filename,
+            sheet_name=sheet_name,
+            fileobj=fileobj,
+            content_digest=digest,
+        )
+        nbytes = self._estimate_bytes(excelbot)
+        if nbytes > self.max_bytes:
+            return excelbot
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+            # Content-addressed, so the entry can never go stale
+            self._entries[key] = (excelbot, digest, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+        return excelbot
+
+    def invalidate(self, file_path: str | None = None) -> None:
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                self.current_bytes = 0
+                return
+            path = self._key_path(file_path)
+            for key in [key for key in self._entries if key[0] == path]:
+                self.current_bytes -= self._entries.pop(key)[2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
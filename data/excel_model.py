@@ -1,33 +1,123 @@
 # excel_model.py
-from langchain.globals import set_debug
 from langchain_openai import ChatOpenAI
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.pydantic_v1 import BaseModel, Field
 from pandasai import SmartDataframe
-from typing import Union
+from data.fingerprint import file_fingerprint, dataframe_fingerprint
+from data.response_cache import ResponseCache, get_response_cache
+from data.profile import ProfileStore
+from data.columnar import ColumnarCache
+from data.duckdb_backend import DuckDBBackend, READERS
+from data.chart_payload import encode_chart_payload, project_chart_frame
+from data.fetch import FetchResult, get_fetcher
+from data.tracing import get_tracer
+from data.config import configure
+from typing import BinaryIO, Union
+import numpy as np
 import pandas as pd
-import requests
+import hashlib
+import logging
+import json
 import re
-import io
 import os
-from dotenv import load_dotenv
 
-load_dotenv(override=True)
+logger = logging.getLogger("pdfexcel.excel")
+
+UPLOAD_CONTENT_TYPES = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".xls": "application/vnd.ms-excel",
+    ".csv": "text/csv",
+}
+
+VISUALIZATION_KEYWORDS = re.compile(
+    r"\b(plot|chart|graph|visuali[sz]\w*|diagram|histogram|pie|bar|line|"
+    r"scatter|heat ?map|draw|trend)s?\b",
+    re.IGNORECASE,
+)
+
+
+class RefinedQuery(BaseModel):
+    refined_query: str = Field(description="The refined, structured query.")
+    is_visualization: bool = Field(
+        description="True if the query asks for any form of data visualization "
+        "(e.g., plot, graph, chart, diagram)."
+    )
 
-set_debug(True)
 
 class ExcelBot:
-    def __init__(self, file_path: str, sheet_name: Union[str, int] = 0) -> None:
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        self.df: pd.DataFrame = self.load_excel_file(file_path, sheet_name=sheet_name)
-        self.clean_df: pd.DataFrame = self.clean_dataframe_columns(self.df)
-        self.llm = ChatOpenAI(model="o3-mini", api_key=self.api_key)
-        (
-            self.column_value_pairs,
-            self.column_list,
-            self.sample_data,
-        ) = self.create_metadata()
-        self.smart_df = SmartDataframe(
-            self.clean_df, config={"llm": self.llm, "conversational": False}
-        )
+    def __init__(
+        self,
+        file_path: str,
+        sheet_name: Union[str, int] = 0,
+        low_latency: bool = False,
+        response_cache: ResponseCache | None = None,
+        backend: str = "pandas",
+        sample_rows: int = 10_000,
+        llm: BaseChatModel | None = None,
+        api_key: str | None = None,
+        fileobj: BinaryIO | None = None,
+        content_digest: str | None = None,
+        fetched: FetchResult | None = None,
+    ) -> None:
+        configure()
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.low_latency = low_latency
+        self.response_cache = response_cache or get_response_cache()
+        self.data_fingerprint = None
+        if content_digest is not None:
+            # Uploads: parsed from `fileobj`, or from the columnar cache when the
+            # bytes are gone; `file_path` is only the uploaded file's name
+            self.data_fingerprint = f"{content_digest}:{sheet_name}"
+        elif os.path.isfile(file_path):
+            self.data_fingerprint = f"{file_fingerprint(file_path)}:{sheet_name}"
+        self.columnar_cache = ColumnarCache()
+        cached_df = None
+        self.backend: DuckDBBackend | None = None
+        if backend == "duckdb":
+            if self.data_fingerprint is None or content_digest is not None:
+                raise ValueError("The duckdb backend requires a local file.")
+            self.backend = self.load_duckdb_backend(file_path, sheet_name)
+            # Metadata and code generation only ever see a bounded sample
+            cached_df = self.backend.sample(sample_rows)
+            self.data_fingerprint += ":duckdb"
+        elif backend != "pandas":
+            raise ValueError(f"Unsupported backend: {backend}")
+        elif self.data_fingerprint is not None:
+            cached_df = self.columnar_cache.load(self.data_fingerprint)
+
+        if cached_df is not None:
+            self.df: pd.DataFrame = cached_df
+            self.clean_df: pd.DataFrame = cached_df
+        elif content_digest is not None and fileobj is None:
+            raise FileNotFoundError("This upload is no longer cached, upload it again.")
+        else:
+            with get_tracer().span("excel_load", source=file_path):
+                self.df: pd.DataFrame = self.load_excel_file(
+                    file_path, sheet_name=sheet_name, fileobj=fileobj, fetched=fetched
+                )
+                self.clean_df: pd.DataFrame = self.clean_dataframe_columns(self.df)
+            if self.data_fingerprint is not None:
+                self.columnar_cache.store(self.data_fingerprint, self.clean_df)
+        if self.data_fingerprint is None:
+            self.data_fingerprint = dataframe_fingerprint(self.clean_df)
+        self.llm = llm or ChatOpenAI(model="o3-mini", api_key=self.api_key)
+        with get_tracer().span("profile"):
+            (
+                self.column_value_pairs,
+                self.column_list,
+                self.sample_data,
+            ) = self.create_metadata()
+        if self.backend is not None:
+            schema = [list(column) for column in self.backend.schema()]
+            # Read once: requests never touch the shared connection for this
+            self.sql_schema = ", ".join(f'"{name}" ({dtype})' for name, dtype in schema)
+        else:
+            schema = [[str(c), str(t)] for c, t in self.clean_df.dtypes.items()]
+        # Generated code depends on the columns, not the values
+        self.schema_fingerprint = hashlib.sha256(
+            json.dumps(schema).encode("utf-8")
+        ).hexdigest()
         self.plot_prompt = """
 You have to convert Python Matplotlib code that may use a DataFrame (`df`) to generate a chart into JavaScript (React) code that uses a JSON object (`json_data`) to generate an equivalent chart using Recharts, charting library built with React and D3.
 
@@ -46,6 +136,7 @@ You have to convert Python Matplotlib code that may use a DataFrame (`df`) to ge
 2. **Necessary Considerations**:
 - Instead of the dataframe `df` or `dfs`(list of df) that may be specified in the matplotlib code, take json object called `json_data` or a list of `json_data` in Recharts code.
 - Consider that the `json_data`, created from the dataframe `df` will be loaded from a ".json" file, and that `json_data` variable is to be used in the Recharts code.
+- `json_data` is columnar: `{"columns": [...], "rows": n, "data": {"<column>": [values...]}}`. Convert it to the row objects Recharts expects (e.g. `json_data.data[json_data.columns[0]].map((_, i) => ...)`) before passing it to a chart.
 - Extract the fields, filters and other aspects of the Matplotlib code, for the creation of Recharts code.
 - DO NOT make any example data in the code, just use the `json_data` or a list of `json_data` variable(s), inplace of `df` or `dfs`.
 
@@ -119,22 +210,42 @@ Refine the user query based on the above instructions.
     #### User Query:
     """
         )
+        self.sql_prompt = """
+You are an expert DuckDB SQL writer. Write ONE DuckDB SQL SELECT query over the table `data` that answers the refined query below.
+- Use only the listed columns, always wrapped in double quotes.
+- Filter and aggregate in SQL so the result is as small as possible.
+- For chart requests, return only the columns and aggregated rows the chart needs.
+- Return only the SQL query, without any explanation.
+"""
         self.prompt_template = "System:\n" + self.system_prompt + self.human_prompt
+        # Built once per sheet; the constant prefix also lets the provider reuse
+        # its prompt cache across calls
+        self.refine_prefix = SystemMessage(
+            content=self.system_prompt
+            + self.human_prompt.replace("#### User Query:", "").rstrip()
+            + "\n\nAlso decide whether the user query requests any form of data "
+            "visualization (e.g., plot, graph, chart, diagram)."
+        )
+        self.structured_llm = self.llm.with_structured_output(RefinedQuery)
 
     def load_excel_file(
-        self, file_path_or_url: str, sheet_name: Union[str, int] = 0
+        self,
+        file_path_or_url: str,
+        sheet_name: Union[str, int] = 0,
+        fileobj: BinaryIO | None = None,
+        fetched: FetchResult | None = None,
     ) -> pd.DataFrame:
-        def load_data(content, content_type):
+        def load_data(source, content_type):
             if (
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 in content_type
             ):  # XLSX
-                return pd.read_excel(io.BytesIO(content), sheet_name=sheet_name)
+                return pd.read_excel(source, sheet_name=sheet_name)
             elif "application/vnd.ms-excel" in content_type:  # XLS
-                return pd.read_excel(io.BytesIO(content), sheet_name=sheet_name)
+                return pd.read_excel(source, sheet_name=sheet_name)
             elif "text/csv" in content_type or "application/csv" in content_type:  # CSV
                 # Read initially without setting an index column
-                df = pd.read_csv(io.BytesIO(content), index_col=False)
+                df = pd.read_csv(source, index_col=False)
                 # Check if the first column should be the index
                 if (
                     df.columns[0].lower().startswith("unnamed")
@@ -146,7 +257,14 @@ Refine the user query based on the above instructions.
             else:
                 raise ValueError("Unsupported file type or content type.")
 
-        if os.path.isfile(file_path_or_url):
+        if fileobj is not None:
+            # Uploaded bytes, read in place without a round-trip through disk
+            extension = os.path.splitext(file_path_or_url)[1].lower()
+            if extension not in UPLOAD_CONTENT_TYPES:
+                raise ValueError("Unsupported file type for upload.")
+            fileobj.seek(0)
+            df = load_data(fileobj, UPLOAD_CONTENT_TYPES[extension])
+        elif os.path.isfile(file_path_or_url):
             # If it's a local file path, read it directly
             if file_path_or_url.endswith(".xlsx"):
                 df = pd.read_excel(file_path_or_url, sheet_name=sheet_name)
@@ -163,31 +281,38 @@ Refine the user query based on the above instructions.
             else:
                 raise ValueError("Unsupported file type for local file.")
         else:
-            # Fetch the data using requests
-            response = requests.get(
-                file_path_or_url, headers={"User-Agent": "Mozilla/5.0"}
-            )
-            response.raise_for_status()  # Raise an error for bad status codes
-
-            # Determine content type
-            content_type = response.headers.get("Content-Type")
+            # Stream through the shared session; unchanged files revalidate with
+            # a 304 and are read from the on-disk fetch cache. A caller that
+            # already fetched the URL (ExcelBotCache) passes the result in
+            if fetched is None:
+                fetched = get_fetcher().fetch(file_path_or_url)
 
             # Read the content into a pandas DataFrame
             try:
-                df = load_data(response.content, content_type)
+                df = load_data(fetched.source, fetched.content_type)
             except ValueError as e:
                 print(e)
                 return pd.DataFrame()  # Return an empty DataFrame on error
+            finally:
+                fetched.close()
 
         # Drop initial empty rows
         df = df.dropna(how="all").reset_index(drop=True)
+        df = self.merge_header_rows(df)
+
+        # Drop initial empty rows (redundant if already done above, but keeping for completeness)
+        df = df.dropna(how="all").reset_index(drop=True)
+
+        return df
 
+    def merge_header_rows(self, df: pd.DataFrame) -> pd.DataFrame:
         # Check if the first two rows contain strings to determine if it has a multi-level header
         if len(df) > 1:
-            first_row_is_str = all(isinstance(i, str) or pd.isna(i) for i in df.iloc[0])
-            second_row_is_str = all(
-                isinstance(i, str) or pd.isna(i) for i in df.iloc[1]
-            )
+            head = df.iloc[:2].to_numpy(dtype=object)
+            is_text = np.vectorize(lambda i: isinstance(i, str), otypes=[bool])(head)
+            rows_are_str = (is_text | pd.isna(head)).all(axis=1)
+            first_row_is_str = bool(rows_are_str[0])
+            second_row_is_str = bool(rows_are_str[1])
         else:
             first_row_is_str = False
             second_row_is_str = False
@@ -198,12 +323,56 @@ Refine the user query based on the above instructions.
                 f"{str(col[0])} {col[1]}".strip() if pd.notna(col[0]) else col[1]
                 for col in df.columns.values
             ]
-
-        # Drop initial empty rows (redundant if already done above, but keeping for completeness)
-        df = df.dropna(how="all").reset_index(drop=True)
-
         return df
 
+    def load_duckdb_backend(
+        self, file_path: str, sheet_name: Union[str, int] = 0
+    ) -> DuckDBBackend:
+        source = file_path
+        if os.path.splitext(file_path)[1].lower() not in READERS:
+            # Workbooks are normalized once into the columnar cache and
+            # scanned from there
+            source = self.columnar_cache.path(self.data_fingerprint)
+            if not os.path.isfile(source):
+                df = self.clean_dataframe_columns(
+                    self.load_excel_file(file_path, sheet_name=sheet_name)
+                )
+                if self.columnar_cache.store(self.data_fingerprint, df) is None:
+                    raise ValueError("Could not convert the file for duckdb.")
+        backend = DuckDBBackend(source)
+        raw_columns = backend.columns()
+        if os.path.splitext(source)[1].lower() != ".csv":
+            # Workbooks come normalized from the columnar cache
+            clean_columns = self.clean_dataframe_columns(
+                pd.DataFrame(columns=raw_columns)
+            ).columns
+            backend.rename_columns(dict(zip(raw_columns, clean_columns)))
+            return backend
+
+        # A CSV is scanned as is, so the view applies load_excel_file's
+        # normalization: pandas' header names, no unnamed unique index column,
+        # no empty rows, merged header rows
+        names = list(pd.read_csv(file_path, index_col=False, nrows=0).columns)
+        if len(names) != len(raw_columns):
+            names = raw_columns
+        exclude = ()
+        if names[0].lower().startswith("unnamed") and backend.is_unique(
+            raw_columns[0]
+        ):
+            exclude = (raw_columns[0],)
+            raw_columns, names = raw_columns[1:], names[1:]
+        head = backend.first_rows(raw_columns)
+        head.columns = names
+        clean_columns = self.clean_dataframe_columns(
+            self.merge_header_rows(head)
+        ).columns
+        backend.rename_columns(
+            dict(zip(raw_columns, clean_columns)),
+            exclude=exclude,
+            drop_empty_rows=True,
+        )
+        return backend
+
     def clean_dataframe_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         def clean_column_name(col):
             # Use regex to remove 'Unnamed: ..._level_...' patterns
@@ -219,25 +388,61 @@ Refine the user query based on the above instructions.
         return df
 
     def create_metadata(self):
-        # Dictionary to hold columns with 15 or fewer unique values
-        column_value_pairs = {}
-
-        # Iterate through each column in the DataFrame
-        for column in self.clean_df.columns:
-            unique_values = self.clean_df[column].nunique()
-            if unique_values <= 15:
-                column_value_pairs[column] = self.clean_df[column].unique().tolist()
-
+        # Profiled once per file version, later bots load the JSON sidecar
+        self.profile = ProfileStore().load_or_create(
+            self.clean_df, self.data_fingerprint
+        )
         return (
-            str(column_value_pairs),
-            str(list(self.clean_df.columns)),
-            str(self.clean_df.head()),
+            self.profile["column_value_pairs"],
+            self.profile["column_list"],
+            self.profile["sample_data"],
         )
 
     def refine_query(self, query):
         prompted_query = self.prompt_template + query + "#### Refined Query:"
-        self.refined_query = self.llm.invoke(prompted_query)
-        return self.refined_query.content
+        cache_key = self.response_cache.key(
+            "refine", prompted_query, self.data_fingerprint
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        # Kept local: one ExcelBot serves concurrent requests
+        refined_query = self.llm.invoke(prompted_query).content
+        self.response_cache.set(cache_key, refined_query)
+        return refined_query
+
+    def refine_and_classify(self, query: str) -> tuple[str, bool]:
+        """
+        Refine the query and detect visualization requests in one LLM call.
+
+        Falls back to a plain refinement call plus the local keyword classifier
+        if the structured response cannot be obtained.
+        """
+        cache_key = self.response_cache.key(
+            "refine_classify", query, self.data_fingerprint
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached[0], cached[1]
+        try:
+            response: RefinedQuery = self.structured_llm.invoke(
+                [self.refine_prefix, HumanMessage(content=query)]
+            )
+            if response is not None:
+                self.response_cache.set(
+                    cache_key, [response.refined_query, response.is_visualization]
+                )
+                return response.refined_query, response.is_visualization
+        except Exception:
+            logger.warning(
+                "Structured refinement failed, falling back to two calls",
+                exc_info=True,
+            )
+        refined_query = self.refine_query(query)
+        return refined_query, self.keyword_visualization_check(query, refined_query)
+
+    def keyword_visualization_check(self, *texts: str) -> bool:
+        return any(VISUALIZATION_KEYWORDS.search(text) for text in texts)
 
     def is_query_valid(self, refined_query: str) -> bool:
         # Check if the refined query references columns in the DataFrame
@@ -268,33 +473,138 @@ Refine the user query based on the above instructions.
         response = self.llm.invoke(visualization_check_prompt)
         return response.content.strip().lower() == 'yes'
     
+    def generate_sql(self, refined_query: str) -> str:
+        prompt = (
+            self.sql_prompt
+            + f"\nColumns: {self.sql_schema}\nSample Data:\n{self.sample_data}"
+            + f"\n\nRefined Query: {refined_query}\nSQL:"
+        )
+        sql = self.llm.invoke(prompt).content
+        match = re.search(r"```(?:sql)?\s*(.*?)```", sql, re.DOTALL)
+        return (match.group(1) if match else sql).strip()
+
+    def sql_chat(self, refined_query: str):
+        result = self.backend.query(self.generate_sql(refined_query))
+        if result.shape == (1, 1):
+            value = result.iat[0, 0]
+            return value.item() if hasattr(value, "item") else value
+        return result
+
+    def new_smart_df(self, df: pd.DataFrame) -> SmartDataframe:
+        # One per request: a SmartDataframe keeps the last generated code and
+        # run state on itself, so sharing it across threads mixes requests up.
+        # The shallow copy keeps generated code that drops or adds columns in
+        # place from changing the cached bot's frame for later requests
+        return SmartDataframe(
+            df.copy(deep=False),
+            config={
+                "llm": self.llm,
+                "conversational": False,
+                "save_charts": False,
+                "open_charts": False,
+            },
+        )
+
+    def plot_code(self, refined_query: str) -> tuple[pd.DataFrame, str, bool]:
+        """
+        Return (chart data, plot code, cache hit) for a visualization query.
+
+        The code is captured from this request's own SmartDataframe. It is
+        cached by (schema, refined query), together with the SQL on the duckdb
+        backend, so a repeated chart request only re-runs the SQL locally and
+        makes no code-generation call.
+        """
+        cache_key = self.response_cache.key(
+            "plot_code", refined_query, self.schema_fingerprint
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            chart_df = self.clean_df
+            if cached["sql"] is not None:
+                chart_df = self.backend.query(cached["sql"])
+            return chart_df, cached["code"], True
+
+        sql = None
+        chart_df = self.clean_df
+        if self.backend is not None:
+            # Plot the aggregated SQL result, never the full file
+            sql = self.generate_sql(refined_query)
+            chart_df = self.backend.query(sql)
+        smart_df = self.new_smart_df(chart_df)
+        smart_df.chat(refined_query, output_type="plot")
+        plot_code = smart_df.last_code_executed or smart_df.last_code_generated
+        if not plot_code:
+            raise ValueError("No plot code was generated for this query.")
+        self.response_cache.set(cache_key, {"sql": sql, "code": plot_code})
+        return chart_df, plot_code, False
+
     def matplotlib_to_recharts(self, plot_code):
         conversion_prompt = self.plot_prompt + f"\n\nMatplotlib Code:\n{plot_code}"
+        # The conversion only depends on the code, so cached code converts once
+        cache_key = self.response_cache.key("recharts", conversion_prompt)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
         response = self.llm.invoke(conversion_prompt).content
         if "```javascript" in response:
             response = response[14:-4]
+        self.response_cache.set(cache_key, response)
         return response
     
-    def excel_invoke(self, query: str):
-        refined_query = self.refine_query(query)
+    def excel_invoke(
+        self,
+        query: str,
+        low_latency: bool | None = None,
+        timings: dict | None = None,
+        chart_encoding: str = "json",
+    ):
+        if low_latency is None:
+            low_latency = self.low_latency
+        # Pass `timings` to read them back, the bot keeps no per-request state
+        timings = {} if timings is None else timings
+        with get_tracer().span("excel_invoke", timings, key="total"):
+            return self._excel_invoke(query, low_latency, timings, chart_encoding)
+
+    def _excel_invoke(
+        self, query: str, low_latency: bool, timings: dict, chart_encoding: str
+    ):
+        tracer = get_tracer()
+        if low_latency:
+            with tracer.span("refine_classify", timings):
+                refined_query, is_visualization = self.refine_and_classify(query)
+        else:
+            with tracer.span("refine", timings):
+                refined_query = self.refine_query(query)
         result = self.is_query_valid(refined_query)
 
         if not result:
             return "I don't know the answer to that question."
 
-        is_visualization = self.check_visualization_request(refined_query)
-        
+        if not low_latency:
+            with tracer.span("classify", timings):
+                is_visualization = self.check_visualization_request(refined_query)
+
         if is_visualization:
-            response = self.smart_df.chat(refined_query, output_type='plot')
-            with open("code.py", "r") as fp:
-                plot_code = fp.read()
-            self.json_data = self.clean_df.to_dict()
-            recharts_code = self.matplotlib_to_recharts(plot_code)
-            recharts_code
-            return recharts_code, self.json_data, True
+            with tracer.span("code_gen", timings):
+                chart_df, plot_code, timings["code_cache_hit"] = self.plot_code(
+                    refined_query
+                )
+            with tracer.span("serialize", timings):
+                # Ship only what the chart plots, in a compact columnar layout
+                json_data = encode_chart_payload(
+                    project_chart_frame(chart_df, plot_code), chart_encoding
+                )
+            timings["payload_bytes"] = json_data["bytes"]
+            with tracer.span("convert", timings):
+                recharts_code = self.matplotlib_to_recharts(plot_code)
+            return recharts_code, json_data, True
         else:
-            response = self.smart_df.chat(refined_query)
+            with tracer.span("code_gen", timings):
+                if self.backend is not None:
+                    response = self.sql_chat(refined_query)
+                else:
+                    response = self.new_smart_df(self.clean_df).chat(refined_query)
 
         if isinstance(response, pd.DataFrame):
             response = response.to_json()
-        return response, None, False
\ No newline at end of file
+        return response, None, False
@@ -0,0 +1,147 @@
+# fetch.py
+from requests.adapters import HTTPAdapter
+import threading
+import tempfile
+import requests
+import hashlib
+import shutil
+import json
+import os
+
+
+class FetchResult:
+    def __init__(self, content_type: str, path=None, fileobj=None, status="") -> None:
+        self.content_type = content_type
+        self.path = path
+        self.fileobj = fileobj
+        # "downloaded", "revalidated" (304) or "uncached" (no validators)
+        self.status = status
+
+    @property
+    def source(self):
+        """Something pandas can read: the cached file path or the spooled body."""
+        return self.path if self.path is not None else self.fileobj
+
+    def close(self) -> None:
+        if self.fileobj is not None:
+            self.fileobj.close()
+
+
+class RemoteFetcher:
+    """
+    Fetch remote spreadsheets over a shared, pooled HTTP session.
+
+    Bodies are streamed into a spooled temporary file, which stays in memory up
+    to `spool_bytes` and is capped at `max_bytes`. Responses that carry an ETag
+    or Last-Modified are kept in `cache_dir` and revalidated with conditional
+    requests, so an unchanged file costs a 304 instead of a download.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | None = None,
+        max_bytes: int | None = None,
+        spool_bytes: int = 8 * 1024 * 1024,
+        timeout: float = 30,
+        pool_size: int = 16,
+        session: requests.Session | None = None,
+    ) -> None:
+        self.cache_dir = cache_dir or os.getenv("FETCH_CACHE_DIR", "./.fetch_cache")
+        self.max_bytes = max_bytes or int(
+            os.getenv("FETCH_MAX_BYTES", 512 * 1024 * 1024)
+        )
+        self.spool_bytes = spool_bytes
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": "Mozilla/5.0"})
+
+    def _cache_paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.body", f"{base}.json"
+
+    def _read_meta(self, body_path: str, meta_path: str) -> dict | None:
+        if not os.path.isfile(body_path):
+            return None
+        try:
+            with open(meta_path, "r") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def fetch(self, url: str) -> FetchResult:
+        body_path, meta_path = self._cache_paths(url)
+        meta = self._read_meta(body_path, meta_path)
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        with self.session.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            if response.status_code == 304 and meta is not None:
+                return FetchResult(
+                    meta.get("content_type", ""), path=body_path, status="revalidated"
+                )
+            response.raise_for_status()
+
+            content_length = int(response.headers.get("Content-Length") or 0)
+            if content_length > self.max_bytes:
+                raise ValueError(f"Remote file is larger than {self.max_bytes} bytes")
+            spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+            size = 0
+            try:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(
+                            f"Remote file is larger than {self.max_bytes} bytes"
+                        )
+                    spool.write(chunk)
+            except Exception:
+                spool.close()
+                raise
+            spool.seek(0)
+
+            content_type = response.headers.get("Content-Type", "")
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        if not (etag or last_modified):
+            return FetchResult(content_type, fileobj=spool, status="uncached")
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with spool, open(tmp_path, "wb") as fp:
+            shutil.copyfileobj(spool, fp)
+        os.replace(tmp_path, body_path)
+        with open(meta_path, "w") as fp:
+            json.dump(
+                {
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "content_type": content_type,
+                    "bytes": size,
+                },
+                fp,
+            )
+        return FetchResult(content_type, path=body_path, status="downloaded")
+
+
+_shared_fetcher: RemoteFetcher | None = None
+_shared_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> RemoteFetcher:
+    global _shared_fetcher
+    with _shared_fetcher_lock:
+        if _shared_fetcher is None:
+            _shared_fetcher = RemoteFetcher()
+        return _shared_fetcher
@@ -0,0 +1,42 @@
+# fingerprint.py
+from typing import TYPE_CHECKING
+import threading
+import hashlib
+import os
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_file_digests: dict = {}
+_file_digests_lock = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def file_fingerprint(file_path: str) -> str:
+    """sha256 of a file's content, memoized on (path, mtime, size)."""
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    memo_key = (path, stat.st_mtime_ns, stat.st_size)
+    with _file_digests_lock:
+        if memo_key in _file_digests:
+            return _file_digests[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1024 * 1024), b""):
+            digest.update(block)
+
+    with _file_digests_lock:
+        _file_digests[memo_key] = digest.hexdigest()
+    return _file_digests[memo_key]
+
+
+def dataframe_fingerprint(df: "pd.DataFrame") -> str:
+    import pandas as pd
+
+    digest = hashlib.sha256(str(list(df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
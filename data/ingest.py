@@ -4,14 +4,57 @@ from langchain_community.document_loaders import PyPDFLoader, UnstructuredURLLoa
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores.chroma import Chroma
 from langchain_core.documents import Document
+from data.embedding_cache import CachedEmbeddings
+from data.pdf_extract import get_pdf_extractor
+from data.tracing import get_tracer
+from typing import BinaryIO, Callable, Iterator
+import hashlib
 import os
 
 
+def chunk_id(user_id, source, page, content: str) -> str:
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    key = f"{user_id}\0{source}\0{page}\0{content_hash}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
 class DocLoader:
-    def __init__(self, user_id, api_key, file_path, persist_dir="./chromadb") -> None:
+    def __init__(
+        self,
+        user_id,
+        api_key,
+        file_path,
+        persist_dir="./chromadb",
+        embeddings: OpenAIEmbeddings | None = None,
+        vectorstore: Chroma | None = None,
+        batch_size: int = 256,
+        on_progress: Callable[[dict], None] | None = None,
+        fileobj: BinaryIO | None = None,
+        source: str | None = None,
+        content_digest: str | None = None,
+        pdf_workers: int | None = None,
+    ) -> None:
         self.user_id = user_id
         self.file_path = file_path
-        self.embeddings = OpenAIEmbeddings(api_key=api_key)
+        # Uploaded bytes are parsed straight from `fileobj`; `file_path` then
+        # only names the file. `source` goes into the chunk ids, so it must stay
+        # the same across versions of a document (e.g. the uploaded filename)
+        self.fileobj = fileobj
+        self.source = source or file_path
+        # sha256 of the uploaded bytes, stored on every chunk for deduplication
+        self.content_digest = content_digest
+        # Upper bound on chunks held in memory between parsing and indexing
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        # Above 1, PDF text is extracted by a process pool of this size
+        self.pdf_workers = pdf_workers or int(os.getenv("PDF_EXTRACT_WORKERS", 1))
+        embeddings = embeddings or OpenAIEmbeddings(
+            model="text-embedding-3-small", api_key=api_key
+        )
+        if not isinstance(embeddings, CachedEmbeddings):
+            embeddings = CachedEmbeddings(embeddings)
+        self.embeddings: CachedEmbeddings = embeddings
+        self.vectorstore = vectorstore
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=2000,
             chunk_overlap=200,
@@ -24,12 +67,11 @@ class DocLoader:
                 "",
             ],
         )
+        self.persist_directory = persist_dir
         try:
-            if os.path.exists(persist_dir):
-                self.persist_directory = persist_dir
-            else:
+            # Only needed when no store is injected and the loader opens its own
+            if vectorstore is None and not os.path.exists(persist_dir):
                 os.mkdir(persist_dir)
-                self.persist_directory = persist_dir
         except FileNotFoundError as e:
             raise FileNotFoundError(
                 f"Database Directory not found: {persist_dir}"
@@ -37,40 +79,185 @@ class DocLoader:
         except Exception as e:
             raise ValueError(f"Error during data ingestion: {e}") from e
 
-    def ingest_document(self):
-        self.delete_db(user_id=self.user_id)
-        self.document_list: list[Document] = list()
-        print(self.file_path)
+    def iter_stream_pages(self, file_extension: str) -> Iterator[Document]:
+        self.fileobj.seek(0)
+        if file_extension == ".pdf":
+            from pypdf import PdfReader
 
+            reader = PdfReader(self.fileobj)
+            for page_number, page in enumerate(reader.pages):
+                yield Document(
+                    page_content=page.extract_text(),
+                    metadata={"source": self.source, "page": page_number},
+                )
+        elif file_extension in [".txt", ".md", ".text"]:
+            text = self.fileobj.read().decode("utf-8", errors="replace")
+            yield Document(page_content=text, metadata={"source": self.source})
+        else:
+            raise ValueError(f"Unsupported file format for uploads: {file_extension}")
+
+    def iter_parallel_pdf_pages(self) -> Iterator[Document]:
+        extractor = get_pdf_extractor(self.pdf_workers)
+        for page_number, text in extractor.iter_pages(self.file_path):
+            yield Document(
+                page_content=text,
+                metadata={"source": self.source, "page": page_number},
+            )
+
+    def iter_chunks(self) -> Iterator[Document]:
+        """Yield split chunks page by page, without loading the whole file."""
         file_extension = os.path.splitext(self.file_path)[1].lower()
 
-        if file_extension == ".pdf":
+        if self.fileobj is not None:
+            pages = self.iter_stream_pages(file_extension)
+        elif (
+            file_extension == ".pdf"
+            and self.pdf_workers > 1
+            and os.path.isfile(self.file_path)  # URLs stay with PyPDFLoader
+        ):
+            pages = self.iter_parallel_pdf_pages()
+        elif file_extension == ".pdf":
             self.loader = PyPDFLoader(self.file_path)
+            pages = self.loader.lazy_load()
         elif file_extension in [".pptx", ".docx", ".txt"]:
             self.loader = UnstructuredURLLoader(urls=[self.file_path])
+            pages = self.loader.lazy_load()
         else:
             raise ValueError(f"Unsupported file format: {file_extension}")
 
-        self.document_list.extend(
-            self.loader.load_and_split(text_splitter=self.text_splitter)
+        tracer = get_tracer()
+        while True:
+            with tracer.span("load"):
+                page = next(pages, None)
+            if page is None:
+                return
+            self.progress["pages"] += 1
+            self._report("parsing")
+            with tracer.span("split"):
+                chunks = self.text_splitter.split_documents([page])
+            yield from chunks
+
+    def _report(self, stage: str) -> None:
+        self.progress["stage"] = stage
+        if self.on_progress is not None:
+            self.on_progress(dict(self.progress))
+
+    def _flush(self, collection, batch: list[Document]) -> None:
+        if not batch:
+            return
+        self._report("embedding")
+        texts = [doc.page_content for doc in batch]
+        with get_tracer().span("embed", chunks=len(texts)):
+            vectors, stats = self.embeddings.embed_documents_with_stats(texts)
+        for key in ("hits", "misses", "embedded", "bytes_saved"):
+            self.embedding_stats[key] += stats[key]
+
+        self._report("indexing")
+        with get_tracer().span("upsert", chunks=len(texts)):
+            collection.upsert(
+                ids=[doc.metadata["chunk_id"] for doc in batch],
+                embeddings=vectors,
+                metadatas=[doc.metadata for doc in batch],
+                documents=texts,
+            )
+        self.progress["added"] += len(batch)
+        batch.clear()
+
+    def ingest_document(self):
+        self.progress = {
+            "stage": "parsing",
+            "pages": 0,
+            "chunks": 0,
+            "added": 0,
+            "kept": 0,
+        }
+        self.embedding_stats = {
+            "hits": 0,
+            "misses": 0,
+            "embedded": 0,
+            "bytes_saved": 0,
+        }
+
+        # Not `or`: an injected store with no documents yet is falsy
+        self.docsearch: Chroma = self.vectorstore
+        if self.docsearch is None:
+            self.docsearch = Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embeddings,
+            )
+        collection = self.docsearch._collection
+        existing_ids = set(
+            collection.get(where={"user_id": self.user_id}, include=[])["ids"]
         )
 
-        for doc_data in self.document_list:
-            doc_data.metadata = {"user_id": self.user_id}
-            # if isinstance(doc_data.page_content, bytes):
-            #     doc_data.page_content = doc_data.page_content.decode("utf-8")
-            # elif isinstance(doc_data.page_content, str):
-            #     doc_data.page_content = doc_data.page_content.encode("utf-8")
-
-        self.docsearch: Chroma = Chroma.from_documents(
-            self.document_list,
-            self.embeddings,
-            persist_directory=self.persist_directory,
+        # Deterministic ids let a re-upload touch only the chunks that changed
+        seen_ids: set[str] = set()
+        kept_metadatas: dict[str, dict] = {}
+        batch: list[Document] = []
+        for doc_data in self.iter_chunks():
+            page = doc_data.metadata.get("page", 0)
+            doc_id = chunk_id(
+                self.user_id, self.source, page, doc_data.page_content
+            )
+            if doc_id in seen_ids:
+                continue
+            seen_ids.add(doc_id)
+            self.progress["chunks"] += 1
+            metadata = {
+                "user_id": self.user_id,
+                "source": self.source,
+                "page": page,
+                "chunk_id": doc_id,
+            }
+            if self.content_digest is not None:
+                metadata["content_digest"] = self.content_digest
+            if doc_id in existing_ids:
+                self.progress["kept"] += 1
+                if self.content_digest is not None:
+                    kept_metadatas[doc_id] = metadata
+                continue
+
+            doc_data.metadata = metadata
+            batch.append(doc_data)
+            if len(batch) >= self.batch_size:
+                self._flush(collection, batch)
+        self._flush(collection, batch)
+
+        # Unchanged chunks keep their vectors but now belong to the new upload
+        kept_ids = list(kept_metadatas)
+        for start in range(0, len(kept_ids), 1000):
+            ids = kept_ids[start : start + 1000]
+            collection.update(
+                ids=ids, metadatas=[kept_metadatas[doc_id] for doc_id in ids]
+            )
+
+        removed_ids = [doc_id for doc_id in existing_ids if doc_id not in seen_ids]
+        for start in range(0, len(removed_ids), 1000):
+            collection.delete(ids=removed_ids[start : start + 1000])
+        self._report("done")
+
+        embedded_chunks = self.embedding_stats["hits"] + self.embedding_stats["misses"]
+        self.embedding_stats["chunks"] = embedded_chunks
+        self.embedding_stats["hit_rate"] = (
+            self.embedding_stats["hits"] / embedded_chunks if embedded_chunks else 0.0
         )
+        self.ingest_stats = {
+            "chunks": {
+                "added": self.progress["added"],
+                "kept": self.progress["kept"],
+                "removed": len(removed_ids),
+            },
+            "pages": self.progress["pages"],
+            "embedding": self.embedding_stats,
+        }
+        return self.ingest_stats
 
     def delete_db(self, user_id):
-        self.pdfsearch: Chroma = Chroma(persist_directory="./chromadb")
+        self.pdfsearch: Chroma = self.vectorstore
+        if self.pdfsearch is None:
+            self.pdfsearch = Chroma(persist_directory=self.persist_directory)
         self.pdfsearch._collection.delete(where={"user_id": user_id})
 
     def __call__(self):
-        self.ingest_document()
\ No newline at end of file
+        with get_tracer().span("ingest", source=self.source):
+            return self.ingest_document()
\ No newline at end of file
@@ -5,22 +5,47 @@ from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.chains.question_answering import load_qa_chain
-from typing import List
+from data.response_cache import ResponseCache
+from data.embedding_cache import CachedEmbeddings
+from data.context_packer import ContextPacker
+from data.tracing import get_tracer
+from typing import Iterator, List
 
 
 class BaseInvoke:
-    def __init__(self, api_key: str, user_id: str, prompt_template: str):
+    def __init__(
+        self,
+        api_key: str,
+        user_id: str,
+        prompt_template: str,
+        llm: ChatOpenAI | None = None,
+        embedding_function: OpenAIEmbeddings | None = None,
+        vectorstore: Chroma | None = None,
+        response_cache: ResponseCache | None = None,
+        search_kwargs: dict | None = None,
+        context_packer: ContextPacker | None = None,
+    ):
         self.api_key = api_key
         self.user_id = user_id
-        self.llm = ChatOpenAI(model="gpt-4o-mini", api_key=api_key)
-        self.embedding_function = OpenAIEmbeddings(
-            model="text-embedding-3-small", api_key=self.api_key
-        )
-        self.vectorstore = Chroma(
-            persist_directory="./chromadb", embedding_function=self.embedding_function
+        self.llm = llm or ChatOpenAI(model="gpt-4o-mini", api_key=api_key)
+        # Cached so warm queries only pay for the vector search
+        self.embedding_function = embedding_function or CachedEmbeddings(
+            OpenAIEmbeddings(model="text-embedding-3-small", api_key=self.api_key)
         )
+        # `is not None`: Chroma's __len__ is the collection count, so an
+        # injected but still empty store is falsy
+        if vectorstore is None:
+            vectorstore = Chroma(
+                persist_directory="./chromadb",
+                embedding_function=self.embedding_function,
+            )
+        self.vectorstore = vectorstore
+        if search_kwargs is None:
+            search_kwargs = {"filter": {"user_id": user_id}}
+        self.context_packer = context_packer or ContextPacker()
+        search_kwargs = {"k": self.context_packer.fetch_k, **search_kwargs}
         self.retriever = self.vectorstore.as_retriever(
-            search_type="similarity", search_kwargs={"filter": {"user_id": user_id}}
+            search_type="similarity", search_kwargs=search_kwargs
         )
         self.prompt = PromptTemplate(
             input_variables=["chat_history", "human_input", "context"],
@@ -32,22 +57,126 @@ class BaseInvoke:
         self.chain = load_qa_chain(
             self.llm, chain_type="stuff", memory=self.memory, prompt=self.prompt
         )
+        self.response_cache = response_cache
+
+    def _prepare(self, query: str, retrieved_docs: List[Document], chat_history=""):
+        with get_tracer().span("pack"):
+            retrieved_docs, context_stats = self.context_packer.pack(
+                query, retrieved_docs
+            )
+        cache_key = None
+        if self.response_cache is not None:
+            # Chunk ids pin the answer to the exact context it was generated
+            # from, and the history to the conversation ("tell me more")
+            chunk_ids = sorted(
+                doc.metadata.get("chunk_id", doc.page_content)
+                for doc in retrieved_docs
+            )
+            cache_key = self.response_cache.key(
+                "qa",
+                f"{self.prompt.template}\n{chat_history}\n{query}",
+                "|".join(chunk_ids),
+            )
+        return retrieved_docs, cache_key, context_stats
+
+    def _format_prompt(
+        self, query: str, retrieved_docs: List[Document], chat_history: str
+    ) -> str:
+        # The same prompt the "stuff" chain builds
+        return self.prompt.format(
+            context="\n\n".join(doc.page_content for doc in retrieved_docs),
+            chat_history=chat_history,
+            human_input=query,
+        )
+
+    def _cached(self, query: str, cache_key: str | None) -> str | None:
+        if cache_key is None:
+            return None
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            self.memory.save_context({"human_input": query}, {"output_text": cached})
+        return cached
+
+    def _chat_history(self) -> str:
+        return self.memory.load_memory_variables({})["chat_history"]
+
+    def answer(self, query: str, retrieved_docs: List[Document]) -> str:
+        retrieved_docs, cache_key, self.context_stats = self._prepare(
+            query, retrieved_docs, self._chat_history()
+        )
+        cached = self._cached(query, cache_key)
+        if cached is not None:
+            return cached
 
-    def invoke(self, query: str | bytes) -> str:
-        if isinstance(query, str):
-            query = query.encode("utf-8")
-        elif isinstance(query, bytes):
-            query = query.decode("utf-8")
-        retrieved_docs: list[Document] = self.retriever.invoke(query)
         self.response = self.chain(
             {"input_documents": retrieved_docs, "human_input": query},
             return_only_outputs=True,
         )
+        if cache_key is not None:
+            self.response_cache.set(cache_key, self.response["output_text"])
         return self.response["output_text"]
 
+    def stream(self, query: str, retrieved_docs: List[Document]) -> Iterator[str]:
+        """
+        Like `answer`, but yield the answer text as the model produces it.
+
+        Builds the same prompt the "stuff" chain would and streams it straight
+        from the chat model. Memory and the response cache are updated once the
+        stream completes.
+        """
+        chat_history = self._chat_history()
+        retrieved_docs, cache_key, self.context_stats = self._prepare(
+            query, retrieved_docs, chat_history
+        )
+        cached = self._cached(query, cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = self._format_prompt(query, retrieved_docs, chat_history)
+        parts = []
+        for chunk in self.llm.stream(prompt):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        output_text = "".join(parts)
+        self.memory.save_context({"human_input": query}, {"output_text": output_text})
+        if cache_key is not None:
+            self.response_cache.set(cache_key, output_text)
+
+    def answer_stateless(
+        self, query: str, retrieved_docs: List[Document]
+    ) -> tuple[str, dict]:
+        """
+        Answer without reading or writing the conversation memory.
+
+        Safe to call from several threads at once, e.g. for batch questions
+        that should not see each other as chat history. Returns the answer
+        and its context stats.
+        """
+        retrieved_docs, cache_key, context_stats = self._prepare(
+            query, retrieved_docs
+        )
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached, context_stats
+
+        prompt = self._format_prompt(query, retrieved_docs, chat_history="")
+        output_text = self.llm.invoke(prompt).content
+        if cache_key is not None:
+            self.response_cache.set(cache_key, output_text)
+        return output_text, context_stats
+
+    def invoke(self, query: str | bytes) -> str:
+        if isinstance(query, bytes):
+            query = query.decode("utf-8")
+        retrieved_docs: list[Document] = self.retriever.invoke(query)
+        return self.answer(query, retrieved_docs)
+
 
 class PDFInvoke(BaseInvoke):
-    def __init__(self, api_key: str, user_id: str):
+    def __init__(self, api_key: str, user_id: str, **kwargs):
         pdf_prompt_template = """
 You are provided with a PDF document as context. Use the information in this document to answer the query as accurately as possible.
 1. First, determine if the context provided is relevant to the input query.
@@ -63,11 +192,11 @@ You are provided with a PDF document as context. Use the information in this doc
 ### Query:
 Human: {human_input}
 AI:"""
-        super().__init__(api_key, user_id, pdf_prompt_template)
+        super().__init__(api_key, user_id, pdf_prompt_template, **kwargs)
 
 
 class DOCXInvoke(BaseInvoke):
-    def __init__(self, api_key: str, user_id: str):
+    def __init__(self, api_key: str, user_id: str, **kwargs):
         docx_prompt_template = """
 You are provided with a DOCX document as context. Utilize the content in this document to answer the query as precisely as possible.
 1. Evaluate if the provided context is relevant to the input query.
@@ -84,11 +213,11 @@ You are provided with a DOCX document as context. Utilize the content in this do
 Human: {human_input}
 AI:""
         """
-        super().__init__(api_key, user_id, docx_prompt_template)
+        super().__init__(api_key, user_id, docx_prompt_template, **kwargs)
 
 
 class TXTInvoke(BaseInvoke):
-    def __init__(self, api_key: str, user_id: str):
+    def __init__(self, api_key: str, user_id: str, **kwargs):
         txt_prompt_template = """
 You are provided with a TXT document as context. Leverage the information in this text document to respond to the query accurately.
 1. Assess if the context is relevant to the query.
@@ -105,11 +234,11 @@ You are provided with a TXT document as context. Leverage the information in thi
 Human: {human_input}
 AI:""
         """
-        super().__init__(api_key, user_id, txt_prompt_template)
+        super().__init__(api_key, user_id, txt_prompt_template, **kwargs)
 
 
 class PPTXInvoke(BaseInvoke):
-    def __init__(self, api_key: str, user_id: str):
+    def __init__(self, api_key: str, user_id: str, **kwargs):
         pptx_prompt_template = """
 You are provided with a PPTX document as context. Use the content in this presentation to answer the query as accurately as possible.
 1. Determine if the context is relevant to the input query.
@@ -125,4 +254,4 @@ You are provided with a PPTX document as context. Use the content in this presen
 ### Query:
 Human: {human_input}
 AI:"""
-        super().__init__(api_key, user_id, pptx_prompt_template)
\ No newline at end of file
+        super().__init__(api_key, user_id, pptx_prompt_template, **kwargs)
\ No newline at end of file
@@ -0,0 +1,270 @@
+# jobs.py
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, deque
+from typing import Callable
+import threading
+import logging
+import sqlite3
+import json
+import time
+import uuid
+import os
+
+logger = logging.getLogger("pdfexcel.jobs")
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+class IngestJobQueue:
+    """
+    Local background queue for document ingestion.
+
+    Jobs run on a bounded thread pool. Jobs for the same user run one at a time,
+    in submission order, so a user's re-uploads never race each other. Job state
+    is mirrored to a SQLite file, so any process sharing the working directory
+    can answer status requests. Each row records the pid of the process that
+    owns it; on start-up, queued or running rows whose process is gone (it
+    crashed or was killed mid-job) are marked failed instead of staying
+    pending forever. Finished jobs are deleted `ttl` seconds after they end.
+    """
+
+    def __init__(
+        self,
+        rag_factory: Callable,
+        max_workers: int = 2,
+        db_path: str | None = None,
+        flush_interval: float = 0.5,
+        ttl: float | None = None,
+    ) -> None:
+        self.rag_factory = rag_factory
+        self.flush_interval = flush_interval
+        self.ttl = ttl if ttl is not None else float(
+            os.getenv("INGEST_JOBS_TTL", 7 * 24 * 3600)
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+        self._lock = threading.Lock()
+        self._jobs: dict = {}
+        self._pending: dict = defaultdict(deque)
+        self._active_users: set = set()
+        self._conn = sqlite3.connect(
+            db_path or os.getenv("INGEST_JOBS_DB", "./ingest_jobs.db"),
+            check_same_thread=False,
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs "
+            "(job_id TEXT PRIMARY KEY, state TEXT, pid INTEGER, finished_at REAL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if "pid" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN pid INTEGER")
+        if "finished_at" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN finished_at REAL")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)"
+        )
+        self._conn.commit()
+        self.reconcile()
+        self.prune()
+
+    def reconcile(self) -> int:
+        """Fail the unfinished jobs of processes that no longer run; return how many."""
+        pid = os.getpid()
+        now = time.time()
+        interrupted, finished = [], []
+        with self._lock:
+            for job_id, state, owner in self._conn.execute(
+                "SELECT job_id, state, pid FROM jobs WHERE finished_at IS NULL"
+            ).fetchall():
+                job = json.loads(state)
+                if job["status"] in TERMINAL_STATUSES:
+                    # Finished before finished_at was recorded, expire from now
+                    finished.append((now, job_id))
+                    continue
+                # A row with this process's pid was left by an earlier process
+                # that had the same pid, this one has not submitted anything
+                if owner is not None and owner != pid and process_alive(owner):
+                    continue
+                job["status"] = "failed"
+                job["stage"] = "done"
+                job["error"] = "interrupted: the process running this job exited"
+                interrupted.append((json.dumps(job), now, job_id))
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, finished_at = ? WHERE job_id = ?",
+                interrupted,
+            )
+            self._conn.executemany(
+                "UPDATE jobs SET finished_at = ? WHERE job_id = ?", finished
+            )
+            self._conn.commit()
+        if interrupted:
+            logger.warning(
+                "Marked %d interrupted ingest job(s) as failed", len(interrupted)
+            )
+        return len(interrupted)
+
+    def prune(self) -> int:
+        """Delete jobs that finished more than `ttl` seconds ago; return how many."""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    @staticmethod
+    def _state(job: dict) -> str:
+        # Callers hold self._lock: the worker thread updates the job under it
+        return json.dumps({k: v for k, v in job.items() if not k.startswith("_")})
+
+    def _persist(self, job: dict) -> None:
+        with self._lock:
+            job["_flushed_at"] = time.monotonic()
+            state = self._state(job)
+            finished_at = time.time() if job["status"] in TERMINAL_STATUSES else None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, state, pid, finished_at) "
+                "VALUES (?, ?, ?, ?)",
+                (job["job_id"], state, os.getpid(), finished_at),
+            )
+            self._conn.commit()
+
+    def submit(
+        self,
+        user_id: str,
+        file_path: str,
+        on_complete: Callable[[dict], None] | None = None,
+        **load_kwargs,
+    ) -> str:
+        """
+        Queue `rag.load_db(file_path, user_id, **load_kwargs)`.
+
+        `on_complete` is called with the finished job, whatever its status,
+        e.g. to release an upload buffer or record a successful ingestion.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "file_path": file_path,
+            "status": "queued",
+            "stage": "queued",
+            "progress": {},
+            "timings": {},
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "_started": time.monotonic(),
+            "_load_kwargs": load_kwargs,
+            "_on_complete": on_complete,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            if user_id in self._active_users:
+                self._pending[user_id].append(job_id)
+                job_id_to_run = None
+            else:
+                self._active_users.add(user_id)
+                job_id_to_run = job_id
+        self._persist(job)
+        if job_id_to_run is not None:
+            self._executor.submit(self._run, job_id_to_run)
+        return job_id
+
+    def _enter_stage(self, job: dict, stage: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            timings = job["timings"]
+            timings[job["stage"]] = round(
+                timings.get(job["stage"], 0.0) + now - job["_stage_started"], 4
+            )
+            job["stage"] = stage
+            job["_stage_started"] = now
+
+    def _on_progress(self, job: dict, progress: dict) -> None:
+        stage_changed = progress["stage"] != job["stage"]
+        if stage_changed:
+            self._enter_stage(job, progress["stage"])
+        with self._lock:
+            job["progress"] = {k: v for k, v in progress.items() if k != "stage"}
+        since_flush = time.monotonic() - job["_flushed_at"]
+        if stage_changed or since_flush > self.flush_interval:
+            self._persist(job)
+
+    def _run(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["_stage_started"] = job["_started"]
+        self._enter_stage(job, "parsing")
+        self._persist(job)
+        try:
+            rag_model = self.rag_factory()
+            result = rag_model.load_db(
+                job["file_path"],
+                job["user_id"],
+                on_progress=lambda progress: self._on_progress(job, progress),
+                **job["_load_kwargs"],
+            )
+            with self._lock:
+                job["result"] = result
+                job["status"] = "succeeded"
+        except Exception as e:
+            with self._lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+        finally:
+            if job["stage"] != "done":
+                self._enter_stage(job, "done")
+            with self._lock:
+                total = round(time.monotonic() - job["_started"], 4)
+                job["timings"]["total"] = total
+            self._persist(job)
+            if job["_on_complete"] is not None:
+                try:
+                    job["_on_complete"](job)
+                except Exception:
+                    logger.exception("on_complete failed for job %s", job_id)
+            self._next(job["user_id"])
+            self.prune()
+
+    def _next(self, user_id: str) -> None:
+        with self._lock:
+            # Finished jobs are served from SQLite from here on
+            self._jobs = {
+                job_id: job
+                for job_id, job in self._jobs.items()
+                if job["status"] in ("queued", "running")
+            }
+            if self._pending[user_id]:
+                job_id = self._pending[user_id].popleft()
+            else:
+                del self._pending[user_id]
+                self._active_users.discard(user_id)
+                return
+        self._executor.submit(self._run, job_id)
+
+    def status(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                # A copy, the nested progress and timings keep changing
+                state = self._state(job)
+            else:
+                row = self._conn.execute(
+                    "SELECT state FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                state = row[0] if row else None
+        return json.loads(state) if state is not None else None
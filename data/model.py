@@ -1,59 +1,237 @@
 # invoke.py
-from data.ingest import DocLoader
-from data.invoke import PDFInvoke, DOCXInvoke, TXTInvoke, PPTXInvoke
+from data.ingest import DocLoader, chunk_id
+from data.session import SessionRegistry
+from data.tracing import get_tracer
+from data.config import configure
 
-from langchain_community.vectorstores.chroma import Chroma
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.documents import Document
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+import time
 import os
-from dotenv import load_dotenv
-
-load_dotenv(override=True)
 
 
 class RAG:
-    def __init__(self) -> None:
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo", api_key=self.api_key)
-        self.embedding_function = OpenAIEmbeddings(
-            model="text-embedding-3-small", api_key=self.api_key
-        )
+    def __init__(
+        self, api_key: str | None = None, registry: SessionRegistry | None = None
+    ) -> None:
+        configure()
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.registry = registry or SessionRegistry(api_key=self.api_key)
+        self.llm = self.registry.get_llm("gpt-3.5-turbo")
+        self.embedding_function = self.registry.get_embeddings()
 
-    def load_db(self, file_path, user_id):
-        try:
-            self.delete_db(user_id)
-        except:
-            pass
+    def load_db(
+        self,
+        file_path,
+        user_id,
+        on_progress=None,
+        fileobj=None,
+        source=None,
+        content_digest=None,
+    ):
+        # DocLoader diffs against the user's existing chunks, only the chat
+        # sessions built on the previous document need resetting here
+        self.registry.evict_user(user_id)
         self.docloader = DocLoader(
-            user_id=user_id, file_path=file_path, api_key=self.api_key
+            user_id=user_id,
+            file_path=file_path,
+            api_key=self.api_key,
+            persist_dir=self.registry.persist_directory,
+            embeddings=self.embedding_function,
+            vectorstore=self.registry.get_user_vectorstore(user_id),
+            batch_size=int(os.getenv("INGEST_BATCH_SIZE", 256)),
+            on_progress=on_progress,
+            fileobj=fileobj,
+            source=source,
+            content_digest=content_digest,
+        )
+        self.ingest_stats = self.docloader()
+        return self.ingest_stats
+
+    def attach_document(
+        self, user_id, owner_id, content_digest: str, source: str
+    ) -> dict | None:
+        """
+        Give `user_id` a copy of the chunks `owner_id` ingested from the upload
+        with sha256 `content_digest`, filed under the user's own `source`.
+
+        Vectors, texts and pages are copied as stored, so an already ingested
+        upload is neither parsed nor embedded again. Like `load_db`, this
+        replaces the user's previous document. Returns None when the owner no
+        longer has the chunks.
+        """
+        owner = self.registry.get_user_vectorstore(owner_id)._collection
+        found = owner.get(
+            where={
+                "$and": [
+                    {"user_id": owner_id},
+                    {"content_digest": content_digest},
+                ]
+            },
+            include=["embeddings", "documents", "metadatas"],
         )
-        self.vectorsearch = self.docloader()
+        if not found["ids"]:
+            return None
+
+        self.registry.evict_user(user_id)
+        target = self.registry.get_user_vectorstore(user_id)._collection
+        existing_ids = set(target.get(where={"user_id": user_id}, include=[])["ids"])
+        ids, metadatas = [], []
+        for text, metadata in zip(found["documents"], found["metadatas"]):
+            page = metadata.get("page", 0)
+            doc_id = chunk_id(user_id, source, page, text)
+            ids.append(doc_id)
+            metadatas.append(
+                {
+                    **metadata,
+                    "user_id": user_id,
+                    "source": source,
+                    "chunk_id": doc_id,
+                }
+            )
+
+        added = [doc_id for doc_id in ids if doc_id not in existing_ids]
+        # The owner is another tenant, so it only goes to the (server-side) trace
+        with get_tracer().span("attach", chunks=len(added), owner_id=owner_id):
+            # Kept chunks are rewritten too, to carry the new content digest
+            for start in range(0, len(ids), 1000):
+                target.upsert(
+                    ids=ids[start : start + 1000],
+                    embeddings=found["embeddings"][start : start + 1000],
+                    metadatas=metadatas[start : start + 1000],
+                    documents=found["documents"][start : start + 1000],
+                )
+            removed_ids = list(existing_ids - set(ids))
+            for start in range(0, len(removed_ids), 1000):
+                target.delete(ids=removed_ids[start : start + 1000])
+
+        pages = {metadata.get("page", 0) for metadata in metadatas}
+        return {
+            "chunks": {
+                "added": len(added),
+                "kept": len(ids) - len(added),
+                "removed": len(removed_ids),
+            },
+            "pages": len(pages),
+        }
 
     def format_docs(self, docs: list[Document]):
         return "\n\n".join(doc.page_content for doc in docs)
 
-    def invoke(self, user_id, query: str | bytes, file_extension: str):
-        if file_extension == "pdf":
-            invoker = PDFInvoke(api_key=self.api_key, user_id=user_id)
-        elif file_extension == "docx":
-            invoker = DOCXInvoke(api_key=self.api_key, user_id=user_id)
-        elif file_extension == "pptx":
-            invoker = PPTXInvoke(api_key=self.api_key, user_id=user_id)
-        elif file_extension == "txt":
-            invoker = TXTInvoke(api_key=self.api_key, user_id=user_id)
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-
-        retrieved_docs: List[Document] = invoker.retriever.invoke(query)
-        print(retrieved_docs)
-
-        self.response = invoker.chain(
-            {"input_documents": retrieved_docs, "human_input": query},
-            return_only_outputs=True,
-        )
-        return self.response["output_text"]
+    def invoke(self, user_id, query: str | bytes, file_extension: str = "pdf"):
+        if isinstance(query, bytes):
+            query = query.decode("utf-8")
+        invoker, lock = self.registry.get_session(user_id, file_extension)
+
+        tracer = get_tracer()
+        with tracer.span("rag_invoke", user_id=user_id):
+            with tracer.span("retrieve"):
+                retrieved_docs: List[Document] = invoker.retriever.invoke(query)
+
+            with lock, tracer.span("generate", chunks=len(retrieved_docs)):
+                self.response = invoker.answer(query, retrieved_docs)
+                # Tokens stuffed into the prompt before and after packing
+                self.context_stats = invoker.context_stats
+        return self.response
+
+    def stream(
+        self,
+        user_id,
+        query: str | bytes,
+        file_extension: str = "pdf",
+        timings: dict | None = None,
+    ) -> Iterator[str]:
+        """
+        Yield the answer as it is generated.
+
+        `timings` receives `ttft` (request start to first token) next to
+        `total`, both in seconds.
+        """
+        if isinstance(query, bytes):
+            query = query.decode("utf-8")
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        invoker, lock = self.registry.get_session(user_id, file_extension)
+
+        tracer = get_tracer()
+        with tracer.span("rag_stream", timings, key="total", user_id=user_id):
+            with tracer.span("retrieve", timings):
+                retrieved_docs: List[Document] = invoker.retriever.invoke(query)
+
+            with lock, tracer.span("generate", chunks=len(retrieved_docs)):
+                for token in invoker.stream(query, retrieved_docs):
+                    if "ttft" not in timings:
+                        timings["ttft"] = round(time.perf_counter() - start, 4)
+                        tracer.observe("ttft", timings["ttft"])
+                    yield token
+                self.context_stats = invoker.context_stats
+
+    def invoke_many(
+        self,
+        user_id,
+        queries: List[str],
+        file_extension: str = "pdf",
+        max_workers: int | None = None,
+    ) -> List[dict]:
+        """
+        Answer many independent questions about a user's documents.
+
+        All queries are embedded in one request and searched in one Chroma
+        call. Answers are generated concurrently, at most `max_workers` at a
+        time, without conversation memory. Each result carries its own
+        timings: the shared embed and search time plus its own generation.
+        """
+        queries = [
+            query.decode("utf-8") if isinstance(query, bytes) else query
+            for query in queries
+        ]
+        if not queries:
+            return []
+        max_workers = max_workers or int(os.getenv("BATCH_MAX_CONCURRENCY", 4))
+        start = time.perf_counter()
+        invoker, _ = self.registry.get_session(user_id, file_extension)
+        search_kwargs = invoker.retriever.search_kwargs
+
+        tracer = get_tracer()
+        shared = {}
+        with tracer.span("embed_queries", shared, key="embed", queries=len(queries)):
+            vectors = self.embedding_function.embed_queries(queries)
+        with tracer.span("retrieve", shared, key="search", queries=len(queries)):
+            results = invoker.vectorstore._collection.query(
+                query_embeddings=vectors,
+                n_results=search_kwargs.get("k", 4),
+                where=search_kwargs.get("filter") or None,
+                include=["documents", "metadatas"],
+            )
+        retrieved = [
+            [
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(texts, metadatas)
+            ]
+            for texts, metadatas in zip(results["documents"], results["metadatas"])
+        ]
+
+        def answer(index: int) -> dict:
+            timings = dict(shared)
+            result = {"query": queries[index]}
+            try:
+                with tracer.span("generate", timings, chunks=len(retrieved[index])):
+                    result["answer"], result["context"] = invoker.answer_stateless(
+                        queries[index], retrieved[index]
+                    )
+            except Exception as e:
+                result["error"] = str(e)
+            timings["total"] = round(time.perf_counter() - start, 4)
+            result["timings"] = timings
+            return result
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(queries)), thread_name_prefix="rag-batch"
+        ) as executor:
+            return list(executor.map(answer, range(len(queries))))
 
-    def delete_db(self, user_id, persist_directory: str = "./chromadb"):
-        self.pdfsearch: Chroma = Chroma(persist_directory=persist_directory)
-        self.pdfsearch._collection.delete(where={"user_id": user_id})
\ No newline at end of file
+    def delete_db(self, user_id, persist_directory: str | None = None):
+        # A collection drop in tenant mode, a filtered delete otherwise. The
+        # registry's own persist_directory unless another one is given
+        self.registry.delete_tenant(user_id, persist_directory)
@@ -0,0 +1,47 @@
+# partition.py
+import hashlib
+import os
+
+SHARED_COLLECTION = "langchain"
+PARTITION_MODES = ("shared", "tenant", "bucket")
+
+
+class TenantPartitioner:
+    """
+    Decide which Chroma collection holds a user's chunks.
+
+    - shared: every user in the default collection, isolated by a user_id filter.
+    - tenant: one collection per user, so search needs no filter and deleting a
+      user is a collection drop.
+    - bucket: users hashed over `buckets` collections and still filtered by
+      user_id, for deployments with too many users for one collection each.
+    """
+
+    def __init__(self, mode: str | None = None, buckets: int | None = None) -> None:
+        self.mode = mode or os.getenv("VECTOR_PARTITIONING", "shared")
+        if self.mode not in PARTITION_MODES:
+            raise ValueError(f"Unsupported partitioning mode: {self.mode}")
+        self.buckets = buckets or int(os.getenv("VECTOR_PARTITION_BUCKETS", 64))
+
+    def collection_name(self, user_id: str) -> str:
+        if self.mode == "shared":
+            return SHARED_COLLECTION
+        digest = hashlib.sha256(str(user_id).encode("utf-8")).hexdigest()
+        if self.mode == "tenant":
+            return f"tenant_{digest[:32]}"
+        return f"bucket_{int(digest, 16) % self.buckets:04d}"
+
+    def search_kwargs(self, user_id: str) -> dict:
+        if self.mode == "tenant":
+            return {}
+        return {"filter": {"user_id": user_id}}
+
+    def delete_tenant(self, client, user_id: str) -> None:
+        name = self.collection_name(user_id)
+        if self.mode == "tenant":
+            try:
+                client.delete_collection(name)
+            except ValueError:
+                pass  # Nothing was ever ingested for this user
+            return
+        client.get_or_create_collection(name).delete(where={"user_id": user_id})
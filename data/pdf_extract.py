@@ -0,0 +1,111 @@
+# pdf_extract.py
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Iterator
+from pypdf import PdfReader
+import multiprocessing
+import threading
+import os
+
+
+def page_count(file_path: str) -> int:
+    # Only the xref and page tree are read, no content streams
+    return len(PdfReader(file_path).pages)
+
+
+def extract_range(file_path: str, start: int, stop: int) -> list[str]:
+    """Text of pages [start, stop); runs in the worker processes."""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+
+class PDFExtractor:
+    """
+    Extract PDF text with a pool of worker processes.
+
+    The document is cut into ranges of `pages_per_task` pages. Each worker opens
+    the file itself and returns the text of its range, and the ranges are
+    yielded back in page order. At most two ranges per worker are in flight, so
+    memory stays bounded on very long documents. Documents shorter than
+    `min_pages` are extracted in the calling process, where starting workers
+    would cost more than it saves.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        pages_per_task: int | None = None,
+        min_pages: int | None = None,
+    ) -> None:
+        self.workers = workers or int(os.getenv("PDF_EXTRACT_WORKERS", 1))
+        self.pages_per_task = pages_per_task or int(
+            os.getenv("PDF_EXTRACT_PAGES_PER_TASK", 16)
+        )
+        self.min_pages = min_pages or int(os.getenv("PDF_EXTRACT_MIN_PAGES", 32))
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the API process runs threads (job workers,
+                # Chroma) whose locks must not be copied into the children
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def iter_pages(self, file_path: str) -> Iterator[tuple[int, str]]:
+        """Yield (page number, text) for every page, in order."""
+        total = page_count(file_path)
+        if self.workers <= 1 or total < self.min_pages:
+            reader = PdfReader(file_path)
+            for page_number, page in enumerate(reader.pages):
+                yield page_number, page.extract_text()
+            return
+
+        pool = self.get_pool()
+        ranges = (
+            (start, min(start + self.pages_per_task, total))
+            for start in range(0, total, self.pages_per_task)
+        )
+        pending: deque = deque()
+        try:
+            for start, stop in ranges:
+                future = pool.submit(extract_range, file_path, start, stop)
+                pending.append((start, future))
+                if len(pending) < 2 * self.workers:
+                    continue
+                yield from self._drain(pending.popleft())
+            while pending:
+                yield from self._drain(pending.popleft())
+        finally:
+            # The consumer stopped early or failed; drop the queued ranges
+            for _, future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _drain(item) -> Iterator[tuple[int, str]]:
+        start, future = item
+        for offset, text in enumerate(future.result()):
+            yield start + offset, text
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+_shared_extractors: dict = {}
+_shared_extractors_lock = threading.Lock()
+
+
+def get_pdf_extractor(workers: int | None = None) -> PDFExtractor:
+    """One extractor, and so one warm process pool, per worker count."""
+    workers = workers or int(os.getenv("PDF_EXTRACT_WORKERS", 1))
+    with _shared_extractors_lock:
+        if workers not in _shared_extractors:
+            _shared_extractors[workers] = PDFExtractor(workers=workers)
+        return _shared_extractors[workers]
@@ -0,0 +1,128 @@
+# profile.py
+import numpy as np
+import pandas as pd
+import hashlib
+import logging
+import json
+import os
+
+logger = logging.getLogger("pdfexcel.profile")
+
+PROFILE_VERSION = 2
+
+
+def count_nulls(values: pd.Series) -> int:
+    array = values.to_numpy()
+    if array.dtype.kind == "f":
+        return int(np.count_nonzero(np.isnan(array)))
+    if array.dtype.kind in "iub":
+        return 0
+    if array.dtype.kind in "mM":
+        return int(np.count_nonzero(np.isnat(array)))
+    return int(values.isna().sum())
+
+
+def count_values(values: np.ndarray, max_unique: int, top_k: int) -> dict:
+    """
+    Distinct count, nulls, top values and (for at most `max_unique` distinct)
+    the distinct values, all from a single `factorize` of `values`.
+    """
+    codes, uniques = pd.factorize(values)
+    missing = codes < 0
+    nulls = int(np.count_nonzero(missing))
+    counts = np.bincount(codes[~missing] if nulls else codes, minlength=len(uniques))
+    if len(uniques) > top_k:
+        top = np.argpartition(-counts, top_k)[:top_k]
+    else:
+        top = np.arange(len(uniques))
+    top = top[np.argsort(-counts[top], kind="stable")]
+    stats = {
+        "distinct": len(uniques),
+        "nulls": nulls,
+        "top_values": [[str(uniques[i]), int(counts[i])] for i in top],
+    }
+    if len(uniques) <= max_unique:
+        # Same values and order as `Series.unique()`, the missing value where
+        # it first occurs
+        unique_values = uniques.tolist()
+        if nulls:
+            first_missing = int(np.argmax(missing))
+            position = int(codes[:first_missing].max()) + 1 if first_missing else 0
+            missing_value = values[first_missing : first_missing + 1].tolist()[0]
+            unique_values.insert(position, missing_value)
+        stats["unique_values"] = unique_values
+    return stats
+
+
+def profile_dataframe(
+    df: pd.DataFrame, max_unique: int = 15, top_k: int = 5, probe_rows: int = 64
+) -> dict:
+    """
+    Profile every column of `df`, hashing each column in full exactly once.
+
+    A numeric or datetime column whose first `probe_rows` rows already hold more
+    than `max_unique` distinct values only gets an exact distinct count
+    (`nunique`) and a vectorized null count; top values of a continuous column
+    say little. Every other column is factorized once, which yields its
+    distinct count, null count, top values and the distinct values listed in
+    the prompt.
+    """
+    column_value_pairs = {}
+    columns = []
+    for column, values in df.items():
+        array = values.to_numpy()
+        # A cheap look at the first rows; `v == v` leaves out NaN
+        probe = {v for v in array[:probe_rows].tolist() if v == v}
+        if array.dtype.kind in "fiumM" and len(probe) > max_unique:
+            stats = {
+                "distinct": int(values.nunique()),
+                "nulls": count_nulls(values),
+                "top_values": [],
+            }
+        else:
+            stats = count_values(array, max_unique, top_k)
+        if "unique_values" in stats:
+            column_value_pairs[column] = stats.pop("unique_values")
+        columns.append({"name": str(column), "dtype": str(values.dtype), **stats})
+
+    return {
+        "version": PROFILE_VERSION,
+        "rows": len(df),
+        "column_value_pairs": str(column_value_pairs),
+        "column_list": str(list(df.columns)),
+        "sample_data": str(df.head()),
+        "columns": columns,
+    }
+
+
+class ProfileStore:
+    """JSON sidecars holding one profile per file version and sheet."""
+
+    def __init__(self, cache_dir: str | None = None) -> None:
+        self.cache_dir = cache_dir or os.getenv(
+            "PROFILE_CACHE_DIR", "./.profile_cache"
+        )
+
+    def _path(self, fingerprint: str) -> str:
+        key = hashlib.sha256(f"{PROFILE_VERSION}:{fingerprint}".encode("utf-8"))
+        return os.path.join(self.cache_dir, f"{key.hexdigest()}.json")
+
+    def load_or_create(self, df: pd.DataFrame, fingerprint: str, **kwargs) -> dict:
+        path = self._path(fingerprint)
+        try:
+            with open(path, "r") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            pass
+
+        profile = profile_dataframe(df, **kwargs)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as fp:
+                json.dump(profile, fp)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The profile is still returned, only the next load re-profiles
+            logger.warning("Could not write profile cache %s", path, exc_info=True)
+        return profile
@@ -0,0 +1,130 @@
+# response_cache.py
+from data.fingerprint import normalize_text
+from collections import OrderedDict
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM responses: an in-memory LRU in front of an optional
+    SQLite file.
+
+    Keys combine a namespace, the normalized prompt and a fingerprint of the data
+    the answer depends on (sheet hash, retrieved chunk ids), so an answer is
+    only reused while its inputs are unchanged.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 24 * 3600,
+        db_path: str | None = None,
+        max_db_entries: int = 100_000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+            )
+            self._conn.commit()
+
+    def key(self, namespace: str, prompt: str, fingerprint: str = "") -> str:
+        raw = f"{namespace}\0{normalize_text(prompt)}\0{fingerprint}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(value), now),
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._trim(now)
+            self._conn.commit()
+
+    def _remember(self, key: str, value, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _trim(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+        )
+        self._conn.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY created_at DESC LIMIT ?)",
+            (self.max_db_entries,),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_shared_cache: ResponseCache | None = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache; set RESPONSE_CACHE_PATH to enable the SQLite tier."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+                ttl=float(os.getenv("RESPONSE_CACHE_TTL", 24 * 3600)),
+                db_path=os.getenv("RESPONSE_CACHE_PATH"),
+            )
+        return _shared_cache
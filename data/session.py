@@ -0,0 +1,197 @@
+# session.py
+from data.partition import SHARED_COLLECTION, TenantPartitioner
+from data.response_cache import get_response_cache
+from typing import TYPE_CHECKING, Callable
+import importlib
+import threading
+import time
+import os
+
+if TYPE_CHECKING:
+    from data.embedding_cache import CachedEmbeddings
+    from langchain_community.vectorstores.chroma import Chroma
+    from langchain_core.embeddings import Embeddings
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+# Resolved on first use, so importing the registry does not load LangChain
+INVOKER_CLASSES = {
+    "pdf": "PDFInvoke",
+    "docx": "DOCXInvoke",
+    "pptx": "PPTXInvoke",
+    "txt": "TXTInvoke",
+}
+
+
+class SessionRegistry:
+    """
+    Process-wide pool of model clients, Chroma clients and per-user invokers.
+
+    Clients are created lazily on first use and shared by every request in the
+    process. Invokers (retriever, QA chain and conversation memory) are kept per
+    (user_id, file_extension) and dropped after `idle_timeout` seconds unused.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        persist_directory: str = "./chromadb",
+        embedding_model: str = "text-embedding-3-small",
+        idle_timeout: float = 1800,
+        max_sessions: int = 1024,
+        partitioner: TenantPartitioner | None = None,
+        llm_factory: Callable[[str], "BaseChatModel"] | None = None,
+        embeddings: "Embeddings | None" = None,
+    ) -> None:
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.persist_directory = persist_directory
+        self.embedding_model = embedding_model
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.partitioner = partitioner or TenantPartitioner()
+        # Injected backends, used by the offline benchmarks instead of OpenAI
+        self.llm_factory = llm_factory
+        self.base_embeddings = embeddings
+        self._lock = threading.RLock()
+        self._llms: dict = {}
+        self._embeddings = None
+        self._clients: dict = {}
+        self._vectorstores: dict = {}
+        # (user_id, file_extension) -> [invoker, lock, last_used]
+        self._sessions: dict = {}
+
+    def get_llm(self, model: str = "gpt-4o-mini") -> "BaseChatModel":
+        with self._lock:
+            if model not in self._llms:
+                if self.llm_factory is not None:
+                    self._llms[model] = self.llm_factory(model)
+                else:
+                    from langchain_openai import ChatOpenAI
+
+                    self._llms[model] = ChatOpenAI(model=model, api_key=self.api_key)
+            return self._llms[model]
+
+    def get_embeddings(self) -> "CachedEmbeddings":
+        with self._lock:
+            if self._embeddings is None:
+                from data.embedding_cache import CachedEmbeddings
+
+                embeddings = self.base_embeddings
+                if embeddings is None:
+                    from langchain_openai import OpenAIEmbeddings
+
+                    embeddings = OpenAIEmbeddings(
+                        model=self.embedding_model, api_key=self.api_key
+                    )
+                self._embeddings = CachedEmbeddings(embeddings)
+            return self._embeddings
+
+    def get_client(self, persist_directory: str | None = None):
+        persist_directory = persist_directory or self.persist_directory
+        with self._lock:
+            if persist_directory not in self._clients:
+                import chromadb
+
+                self._clients[persist_directory] = chromadb.PersistentClient(
+                    path=persist_directory
+                )
+            return self._clients[persist_directory]
+
+    def get_vectorstore(
+        self,
+        persist_directory: str | None = None,
+        collection_name: str = SHARED_COLLECTION,
+    ) -> "Chroma":
+        key = (persist_directory or self.persist_directory, collection_name)
+        with self._lock:
+            if key not in self._vectorstores:
+                from langchain_community.vectorstores.chroma import Chroma
+
+                self._vectorstores[key] = Chroma(
+                    client=self.get_client(key[0]),
+                    collection_name=collection_name,
+                    embedding_function=self.get_embeddings(),
+                )
+            return self._vectorstores[key]
+
+    def get_user_vectorstore(
+        self, user_id: str, persist_directory: str | None = None
+    ) -> "Chroma":
+        collection_name = self.partitioner.collection_name(user_id)
+        if self.partitioner.mode == "tenant":
+            from langchain_community.vectorstores.chroma import Chroma
+
+            # Not pooled, one wrapper per tenant would grow without bound
+            return Chroma(
+                client=self.get_client(persist_directory),
+                collection_name=collection_name,
+                embedding_function=self.get_embeddings(),
+            )
+        return self.get_vectorstore(persist_directory, collection_name)
+
+    def delete_tenant(self, user_id: str, persist_directory: str | None = None) -> None:
+        self.partitioner.delete_tenant(self.get_client(persist_directory), user_id)
+        self.evict_user(user_id)
+
+    def get_session(self, user_id: str, file_extension: str):
+        """
+        Return the (invoker, lock) pair for a user, building it on first use.
+
+        Callers should hold the returned lock while running the invoker's chain,
+        since the conversation memory is not safe to update concurrently.
+        """
+        if file_extension not in INVOKER_CLASSES:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+
+        key = (user_id, file_extension)
+        with self._lock:
+            self.evict_idle()
+            session = self._sessions.get(key)
+            if session is None:
+                invoker_class = getattr(
+                    importlib.import_module("data.invoke"),
+                    INVOKER_CLASSES[file_extension],
+                )
+                invoker = invoker_class(
+                    api_key=self.api_key,
+                    user_id=user_id,
+                    llm=self.get_llm(),
+                    embedding_function=self.get_embeddings(),
+                    vectorstore=self.get_user_vectorstore(user_id),
+                    search_kwargs=self.partitioner.search_kwargs(user_id),
+                    response_cache=get_response_cache(),
+                )
+                session = [invoker, threading.Lock(), time.monotonic()]
+                self._sessions[key] = session
+                self._evict_overflow()
+            session[2] = time.monotonic()
+            return session[0], session[1]
+
+    def evict_user(self, user_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._sessions if key[0] == user_id]:
+                del self._sessions[key]
+
+    def evict_idle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, session in list(self._sessions.items()):
+                if now - session[2] > self.idle_timeout:
+                    del self._sessions[key]
+
+    def _evict_overflow(self) -> None:
+        if len(self._sessions) <= self.max_sessions:
+            return
+        by_age = sorted(self._sessions, key=lambda key: self._sessions[key][2])
+        for key in by_age[: len(self._sessions) - self.max_sessions]:
+            del self._sessions[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "sessions": len(self._sessions),
+                "llm_clients": len(self._llms),
+                "chroma_clients": len(self._clients),
+            }
+            if self._embeddings is not None:
+                stats.update(self._embeddings.stats())
+            return stats
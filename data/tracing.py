@@ -0,0 +1,164 @@
+# tracing.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from bisect import bisect_left
+import threading
+import logging
+import random
+import json
+import time
+import uuid
+import os
+
+logger = logging.getLogger("pdfexcel.trace")
+
+# Seconds; LLM calls dominate the upper buckets, cache hits the lower ones
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# (trace_id, span_id, sampled) of the innermost open span
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Tracer:
+    """
+    Stage timings as Prometheus histograms, plus sampled structured spans.
+
+    Every span is counted in the `pdfexcel_stage_duration_seconds` histogram.
+    A `sample_rate` fraction of traces is also logged as one JSON line per span
+    on the "pdfexcel.trace" logger, with trace and parent ids, so a slow request
+    can be broken down without logging every request. The sampling decision is
+    made at the root span and inherited by its children.
+    """
+
+    def __init__(self, sample_rate: float | None = None, buckets=DEFAULT_BUCKETS):
+        if sample_rate is None:
+            sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", 0.01))
+        self.sample_rate = sample_rate
+        self.buckets = tuple(buckets)
+        self._histograms: dict = {}
+        self._errors: dict = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    @contextmanager
+    def span(self, name: str, timings: dict | None = None, key=None, **attributes):
+        """
+        Time a stage. If `timings` is given, the duration in seconds is also
+        stored there under `key` (default: the span name).
+        """
+        parent = _current_span.get()
+        if parent is None:
+            trace_id = uuid.uuid4().hex
+            sampled = random.random() < self.sample_rate
+        else:
+            trace_id, _, sampled = parent
+        span_id = uuid.uuid4().hex[:16]
+        token = _current_span.set((trace_id, span_id, sampled))
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                pass  # A generator span resumed from another context
+            self.observe(name, elapsed, error=status == "error")
+            if timings is not None:
+                timings[key or name] = round(elapsed, 4)
+            if sampled:
+                logger.info(
+                    json.dumps(
+                        {
+                            "trace_id": trace_id,
+                            "span_id": span_id,
+                            "parent_id": parent[1] if parent else None,
+                            "name": name,
+                            "duration_ms": round(elapsed * 1000, 3),
+                            "status": status,
+                            **attributes,
+                        },
+                        default=str,
+                    )
+                )
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP pdfexcel_stage_duration_seconds Time spent per pipeline stage.",
+            "# TYPE pdfexcel_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                bounds = [*(repr(b) for b in histogram.buckets), "+Inf"]
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        "pdfexcel_stage_duration_seconds_bucket"
+                        f'{{stage="{name}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'pdfexcel_stage_duration_seconds_sum{{stage="{name}"}} '
+                    f"{histogram.sum}"
+                )
+                lines.append(
+                    f'pdfexcel_stage_duration_seconds_count{{stage="{name}"}} '
+                    f"{histogram.count}"
+                )
+            lines += [
+                "# HELP pdfexcel_stage_errors_total Stages that raised.",
+                "# TYPE pdfexcel_stage_errors_total counter",
+            ]
+            for name, count in sorted(self._errors.items()):
+                lines.append(f'pdfexcel_stage_errors_total{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def render_gauges(prefix: str, stats: dict) -> str:
+    """Render the numeric values of a `stats()` dict as Prometheus gauges."""
+    lines = []
+    for name, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        metric = f"pdfexcel_{prefix}_{name}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+_shared_tracer: Tracer | None = None
+_shared_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    global _shared_tracer
+    with _shared_tracer_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer()
+        return _shared_tracer
@@ -0,0 +1,83 @@
+# uploads.py
+from tempfile import SpooledTemporaryFile
+import threading
+import hashlib
+import sqlite3
+import time
+import os
+
+
+class HashingSpool(SpooledTemporaryFile):
+    """
+    Spooled upload buffer that hashes the bytes as they are written.
+
+    Small uploads stay in memory, larger ones roll over to an anonymous temp
+    file. Either way the body is read from the socket once and the sha256 is
+    ready when the write finishes, with no second pass over the data.
+    """
+
+    def __init__(self, max_size: int | None = None) -> None:
+        super().__init__(
+            max_size=max_size or int(os.getenv("UPLOAD_SPOOL_BYTES", 32 * 1024**2))
+        )
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return super().write(data)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+class UploadRegistry:
+    """
+    Which users have ingested which upload, by content hash.
+
+    Only completed ingestions are recorded, so a digest found here has chunks in
+    the vector store tagged `content_digest = <digest>` that can be copied to
+    another user instead of being parsed and embedded again.
+    """
+
+    def __init__(self, db_path: str | None = None) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            db_path or os.getenv("UPLOAD_REGISTRY_DB", "./uploads.db"),
+            check_same_thread=False,
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads (digest TEXT, user_id TEXT, "
+            "filename TEXT, created_at REAL, PRIMARY KEY (digest, user_id))"
+        )
+        self._conn.commit()
+
+    def owners(self, digest: str) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id FROM uploads WHERE digest = ? ORDER BY created_at",
+                (digest,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record(self, digest: str, user_id: str, filename: str) -> None:
+        with self._lock:
+            # A user holds one document at a time, loading replaces the last one
+            self._conn.execute("DELETE FROM uploads WHERE user_id = ?", (user_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?)",
+                (digest, user_id, filename, time.time()),
+            )
+            self._conn.commit()
+
+    def forget(self, user_id: str, digest: str | None = None) -> None:
+        with self._lock:
+            if digest is None:
+                self._conn.execute("DELETE FROM uploads WHERE user_id = ?", (user_id,))
+            else:
+                self._conn.execute(
+                    "DELETE FROM uploads WHERE user_id = ? AND digest = ?",
+                    (user_id, digest),
+                )
+            self._conn.commit()
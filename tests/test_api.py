@@ -0,0 +1,48 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from api import main
+import pytest
+
+
+class StubRAG:
+    def __init__(self) -> None:
+        self.max_workers = None
+
+    def invoke_many(self, user_id, queries, max_workers=None):
+        self.max_workers = max_workers
+        return [{"query": query, "answer": "ok"} for query in queries]
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    stub = StubRAG()
+    monkeypatch.setattr(main, "get_rag", lambda: stub)
+    monkeypatch.setenv("BATCH_MAX_CONCURRENCY", "4")
+    return stub
+
+
+def post_batch(**body):
+    client = main.app.test_client()
+    return client.post(
+        "/pdf_invoke_batch", json={"user_id": "alice", "queries": ["a", "b"], **body}
+    )
+
+
+@pytest.mark.parametrize(
+    "requested, expected",
+    [(None, 4), (2, 2), ("3", 3), (64, 4), (0, 1), (-5, 1)],
+)
+def test_batch_concurrency_is_clamped(rag, requested, expected):
+    response = post_batch(max_concurrency=requested)
+    assert response.status_code == 200
+    assert rag.max_workers == expected
+
+
+@pytest.mark.parametrize("requested", ["many", 2.5, True, [2], {"n": 2}])
+def test_batch_concurrency_must_be_an_integer(rag, requested):
+    response = post_batch(max_concurrency=requested)
+    assert response.status_code == 400
+    assert rag.max_workers is None
@@ -0,0 +1,24 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data.chart_payload import encode_chart_payload, render_json
+import pandas as pd
+import json
+
+
+def test_json_body_is_sent_as_encoded():
+    df = pd.DataFrame({"region": ["East", "Wést"], "sales": [1.5, None]})
+    payload = encode_chart_payload(df, "json")
+    text = render_json({"output": ["code", payload, True], "timings": {}})
+
+    # Spliced verbatim, so `bytes` is exactly what goes over the wire
+    assert payload["body"] in text
+    assert len(payload["body"].encode("utf-8")) == payload["bytes"]
+    body = json.loads(text)["output"][1]["body"]
+    assert body == {
+        "columns": ["region", "sales"],
+        "rows": 2,
+        "data": {"region": ["East", "Wést"], "sales": [1.5, None]},
+    }
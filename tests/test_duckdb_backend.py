@@ -0,0 +1,68 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data.duckdb_backend import DuckDBBackend
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def backend(tmp_path):
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({"region": ["East", "West", "East"], "sales": [10, 20, 30]}).to_csv(
+        path, index=False
+    )
+    return DuckDBBackend(str(path))
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT sum(sales) FROM data",
+        "SELECT sum(sales) FROM data;",
+        "SELECT sum(sales) FROM data -- total of all regions",
+        "SELECT sum(sales) FROM data\n-- total (all regions)\n",
+        "/* total */ SELECT sum(sales) FROM data WHERE region <> '--'",
+    ],
+)
+def test_runs_generated_sql_with_comments(backend, sql):
+    assert backend.query(sql).iat[0, 0] == 60
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM read_csv_auto('/etc/passwd')",
+        "SELECT * FROM '/etc/passwd'",
+        "SELECT * FROM raw_data",
+        "SELECT 1; SELECT 2",
+    ],
+)
+def test_rejects_anything_but_the_data_view(backend, sql):
+    with pytest.raises(ValueError):
+        backend.query(sql)
+
+
+CSV_FILES = {
+    "unnamed_index": ",region,sales\n0,East,10\n1,,\n2,West,20\n",
+    "repeated_unnamed": ",region,sales\n0,East,10\n0,West,20\n",
+    "empty_rows": "region,sales,day\n,,\nEast,10,2024-01-01\n,,\nWest,,2024-01-02\n",
+    "header_rows": "region,quarter\nArea,Period\nEast,Q1\nWest,Q2\n",
+    "duplicate_names": "sales,sales,Unnamed: 5_level_1\n1,2,3\n4,5,6\n",
+}
+
+
+@pytest.mark.parametrize("name", sorted(CSV_FILES))
+def test_csv_view_matches_the_pandas_normalization(tmp_path, name):
+    from data.excel_model import ExcelBot
+
+    path = tmp_path / f"{name}.csv"
+    path.write_text(CSV_FILES[name])
+    parser = ExcelBot.__new__(ExcelBot)
+    expected = parser.clean_dataframe_columns(parser.load_excel_file(str(path)))
+
+    backend = parser.load_duckdb_backend(str(path))
+    assert [column for column, _ in backend.schema()] == list(expected.columns)
+    assert backend.row_count() == len(expected)
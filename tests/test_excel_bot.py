@@ -0,0 +1,56 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fakes import FakeChatModel
+from data.response_cache import ResponseCache
+from data.excel_model import ExcelBot
+import pandas as pd
+import pytest
+
+
+class MutatingChatModel(FakeChatModel):
+    """Generates pandas code that drops a column of `dfs[0]` in place."""
+
+    def respond(self, prompt: str) -> str:
+        if "dfs[0]" in prompt or "```python" in prompt:
+            return (
+                "```python\n"
+                "dfs[0].drop(columns=['sales'], inplace=True)\n"
+                "result = {'type': 'number', 'value': len(dfs[0].columns)}\n"
+                "```"
+            )
+        return super().respond(prompt)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # pandasai writes its cache, charts and log to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("PROFILE_CACHE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setenv("COLUMNAR_CACHE_DIR", str(tmp_path / "columnar"))
+    pd.DataFrame(
+        {"region": ["East", "West"] * 10, "sales": range(20), "units": range(20)}
+    ).to_csv(tmp_path / "sales.csv", index=False)
+    return tmp_path
+
+
+def test_shared_bot_is_unchanged_by_concurrent_requests(workdir):
+    bot = ExcelBot(
+        str(workdir / "sales.csv"),
+        llm=MutatingChatModel(),
+        response_cache=ResponseCache(db_path=str(workdir / "responses.db")),
+    )
+    attributes = {name: id(value) for name, value in vars(bot).items()}
+    before = bot.clean_df.copy()
+
+    queries = [f"How many columns does the sheet have? ({i})" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(bot.excel_invoke, queries))
+
+    assert all(output == (2, None, False) for output in outputs)
+    assert {name: id(value) for name, value in vars(bot).items()} == attributes
+    pd.testing.assert_frame_equal(bot.clean_df, before)
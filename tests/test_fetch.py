@@ -0,0 +1,104 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from data.fetch import RemoteFetcher
+import threading
+import pytest
+
+BODY = b"region,sales\nEast,10\nWest,20\n"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """A local stand-in for a file host, with and without validators."""
+
+    requests_seen: list = []
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.requests_seen.append((self.path, dict(self.headers)))
+        if self.path == "/etag.csv":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send(BODY, {"ETag": '"v1"'})
+        elif self.path == "/plain.csv":
+            self._send(BODY, {})
+        elif self.path == "/big.csv":
+            self._send(b"x" * 4096, {})
+        elif self.path == "/big-chunked.csv":
+            # No Content-Length, the cap has to hold while streaming
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for _ in range(8):
+                self.wfile.write(b"x" * 1024)
+        else:
+            self.send_error(404)
+
+    def _send(self, body: bytes, headers: dict) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    StandInHandler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return RemoteFetcher(cache_dir=str(tmp_path / "fetch"), max_bytes=2048)
+
+
+def read(result) -> bytes:
+    try:
+        if result.path is not None:
+            with open(result.path, "rb") as fp:
+                return fp.read()
+        return result.fileobj.read()
+    finally:
+        result.close()
+
+
+def test_downloads_then_revalidates_with_304(server, fetcher):
+    first = fetcher.fetch(f"{server}/etag.csv")
+    assert first.status == "downloaded"
+    assert first.content_type == "text/csv"
+    assert read(first) == BODY
+
+    second = fetcher.fetch(f"{server}/etag.csv")
+    assert second.status == "revalidated"
+    assert read(second) == BODY
+    assert StandInHandler.requests_seen[-1][1].get("If-None-Match") == '"v1"'
+
+
+def test_without_validators_body_is_spooled_not_cached(server, fetcher):
+    result = fetcher.fetch(f"{server}/plain.csv")
+    assert result.status == "uncached"
+    assert result.path is None
+    assert read(result) == BODY
+    assert not os.path.isdir(fetcher.cache_dir) or not os.listdir(fetcher.cache_dir)
+
+
+@pytest.mark.parametrize("path", ["/big.csv", "/big-chunked.csv"])
+def test_rejects_bodies_over_max_bytes(server, fetcher, path):
+    with pytest.raises(ValueError, match="larger than 2048 bytes"):
+        fetcher.fetch(f"{server}{path}")
@@ -0,0 +1,113 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data.jobs import IngestJobQueue
+import subprocess
+import sqlite3
+import json
+
+
+def write_job(db_path: str, job_id: str, status: str, pid: int | None) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS jobs "
+        "(job_id TEXT PRIMARY KEY, state TEXT, pid INTEGER)"
+    )
+    state = {"job_id": job_id, "status": status, "stage": "parsing", "error": None}
+    conn.execute(
+        "INSERT INTO jobs (job_id, state, pid) VALUES (?, ?, ?)",
+        (job_id, json.dumps(state), pid),
+    )
+    conn.commit()
+    conn.close()
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_unfinished_jobs_of_exited_processes_are_failed(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    write_job(db_path, "crashed", "running", dead_pid())
+    write_job(db_path, "queued-before-pid", "queued", None)
+    write_job(db_path, "done", "succeeded", dead_pid())
+    write_job(db_path, "live", "running", os.getppid())
+
+    queue = IngestJobQueue(rag_factory=lambda: None, db_path=db_path)
+
+    for job_id in ("crashed", "queued-before-pid"):
+        job = queue.status(job_id)
+        assert job["status"] == "failed"
+        assert job["error"].startswith("interrupted")
+    assert queue.status("done")["status"] == "succeeded"
+    # Another worker sharing the database is still running its job
+    assert queue.status("live")["status"] == "running"
+    assert queue.reconcile() == 0
+
+
+def test_adds_the_pid_column_to_an_older_database(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE jobs (job_id TEXT PRIMARY KEY, state TEXT)")
+    conn.execute(
+        "INSERT INTO jobs VALUES (?, ?)",
+        ("old", json.dumps({"job_id": "old", "status": "queued", "error": None})),
+    )
+    conn.commit()
+    conn.close()
+
+    queue = IngestJobQueue(rag_factory=lambda: None, db_path=db_path)
+    assert queue.status("old")["status"] == "failed"
+
+
+class ProgressRAG:
+    """Reports many stage changes, like DocLoader on a long document."""
+
+    def load_db(self, file_path, user_id, on_progress=None, **kwargs):
+        for i in range(600):
+            stage = ("parsing", "embedding", "indexing")[i % 3]
+            on_progress({"stage": stage, "pages": i, "chunks": i})
+        return {"chunks": {"added": 600}}
+
+
+def test_status_can_be_polled_while_the_job_runs(tmp_path):
+    queue = IngestJobQueue(
+        rag_factory=ProgressRAG, db_path=str(tmp_path / "jobs.db"), flush_interval=60
+    )
+    job_id = queue.submit("alice", "report.pdf")
+    job = queue.status(job_id)
+    while job["status"] in ("queued", "running"):
+        job = queue.status(job_id)
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"chunks": {"added": 600}}
+    assert {"parsing", "embedding", "indexing", "total"} <= set(job["timings"])
+
+
+def test_finished_jobs_are_pruned_after_the_ttl(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    queue = IngestJobQueue(rag_factory=ProgressRAG, db_path=db_path, ttl=3600)
+    job_id = queue.submit("alice", "report.pdf")
+    while queue.status(job_id)["status"] in ("queued", "running"):
+        pass
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE jobs SET finished_at = finished_at - 7200")
+    conn.commit()
+    conn.close()
+    assert queue.prune() == 1
+    assert queue.status(job_id) is None
+
+
+def test_on_complete_errors_are_logged(tmp_path, caplog):
+    def on_complete(job):
+        raise RuntimeError("could not release the upload")
+
+    queue = IngestJobQueue(rag_factory=ProgressRAG, db_path=str(tmp_path / "jobs.db"))
+    job_id = queue.submit("alice", "report.pdf", on_complete=on_complete)
+    queue._executor.shutdown(wait=True)
+    assert queue.status(job_id)["status"] == "succeeded"
+    assert "could not release the upload" in caplog.text
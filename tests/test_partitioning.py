@@ -0,0 +1,65 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from data.partition import SHARED_COLLECTION, TenantPartitioner
+from data.session import SessionRegistry
+from data.ingest import DocLoader
+import pytest
+import io
+
+ALICE_DOC = b"Alice's secret salary is 250,000 dollars a year."
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch, request):
+    # The working directory is where a fallback ./chromadb store would appear
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.db"))
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "responses.db"))
+    return SessionRegistry(
+        api_key="sk-test",
+        persist_directory=str(tmp_path / "store"),
+        partitioner=TenantPartitioner(mode=request.param),
+        llm_factory=lambda model: FakeChatModel(),
+        embeddings=FakeEmbeddings(),
+    )
+
+
+def ingest(registry: SessionRegistry, user_id: str, content: bytes) -> dict:
+    return DocLoader(
+        user_id=user_id,
+        api_key=None,
+        file_path="notes.txt",
+        persist_dir=registry.persist_directory,
+        embeddings=registry.get_embeddings(),
+        vectorstore=registry.get_user_vectorstore(user_id),
+        fileobj=io.BytesIO(content),
+    )()
+
+
+def retrieve(registry: SessionRegistry, user_id: str) -> list[str]:
+    invoker, _ = registry.get_session(user_id, "txt")
+    return [doc.page_content for doc in invoker.retriever.invoke("salary")]
+
+
+@pytest.mark.parametrize("registry", ["tenant", "shared", "bucket"], indirect=True)
+def test_tenants_only_retrieve_their_own_chunks(registry, tmp_path):
+    assert ingest(registry, "alice", ALICE_DOC)["chunks"]["added"] == 1
+
+    # The first ingest lands in Alice's (still empty) store, not a fallback
+    assert registry.get_user_vectorstore("alice")._collection.count() == 1
+    assert not os.path.exists(tmp_path / "chromadb")
+    if registry.partitioner.mode == "tenant":
+        names = [c.name for c in registry.get_client().list_collections()]
+        assert SHARED_COLLECTION not in names
+
+    assert retrieve(registry, "alice") == [ALICE_DOC.decode()]
+    # Bob has no documents; his empty store must not widen to everyone's
+    assert retrieve(registry, "bob") == []
+
+    registry.delete_tenant("alice")
+    assert retrieve(registry, "alice") == []
+    assert not os.path.exists(tmp_path / "chromadb")
@@ -0,0 +1,81 @@
+import os
+import sys
+
+# Add the project directory to the sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+from data.partition import TenantPartitioner
+from data.session import SessionRegistry
+from data.uploads import UploadRegistry
+from data.jobs import IngestJobQueue
+from api import main
+import pytest
+import time
+import io
+
+DOCUMENT = b"The travel policy requires manager approval above 500 dollars."
+
+
+@pytest.fixture
+def services(tmp_path, monkeypatch, request):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embeddings.db"))
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "responses.db"))
+    registry = SessionRegistry(
+        api_key="sk-test",
+        persist_directory=str(tmp_path / "store"),
+        partitioner=TenantPartitioner(mode=request.param),
+        llm_factory=lambda model: FakeChatModel(),
+        embeddings=FakeEmbeddings(),
+    )
+    monkeypatch.setitem(main._services, "sessions", registry)
+    monkeypatch.setitem(
+        main._services, "uploads", UploadRegistry(str(tmp_path / "uploads.db"))
+    )
+    monkeypatch.setitem(
+        main._services,
+        "ingest_jobs",
+        IngestJobQueue(rag_factory=main.get_rag, db_path=str(tmp_path / "jobs.db")),
+    )
+    return registry
+
+
+def upload(user_id: str, content: bytes = DOCUMENT):
+    client = main.app.test_client()
+    response = client.post(
+        "/upload",
+        data={"user_id": user_id, "file": (io.BytesIO(content), "policy.txt")},
+        content_type="multipart/form-data",
+    )
+    return response.status_code, response.get_json()
+
+
+def wait_for(condition, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("services", ["tenant", "shared"], indirect=True)
+def test_repeated_uploads_are_deduplicated(services):
+    status, body = upload("alice")
+    assert status == 202
+    digest = body["upload_id"]
+    wait_for(lambda: "alice" in main.get_upload_registry().owners(digest))
+    job = main.get_ingest_jobs().status(body["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["chunks"]["added"] == 1
+
+    # The same user again: nothing to parse or embed
+    status, body = upload("alice")
+    assert status == 200
+    assert body["deduplicated"] is True
+
+    # Another user: Alice's chunks are found in her store and copied
+    status, body = upload("bob")
+    assert status == 200
+    assert body["deduplicated"] is True
+    assert body["stats"]["chunks"]["added"] == 1
+    assert services.get_user_vectorstore("bob")._collection.count() >= 1
+    assert not os.path.exists("chromadb")